@@ -1,7 +1,8 @@
 
-from agents.vision_agents.image_analysis_agent import analyze_image
+from agents.vision_agents.image_analysis_agent import analyze_image, astream_analyze_image
 import os
-import uuid
+import asyncio
+import contextlib
 
 import json
 from typing import TypedDict, Literal, Optional, List
@@ -9,17 +10,41 @@ from langgraph.graph import StateGraph, END
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage
 
 from agents.llm_loader import get_llm
-from agents.medical_chat_agent import get_medical_response
+from agents.medical_chat_agent import aget_medical_response, astream_medical_response
 from agents.rag_agent.response_generator import ResponseGenerator
 from agents.web_search.web_search_processor import WebSearchProcessor
 from agents.guardrails import LocalGuardrails
-from agents.rag_agent.document_retriever import retrieve_documents
+from agents.rag_agent.document_retriever import aretrieve_documents, retrieval_confidence, vector_store
+from agents.async_utils import run_sync
+from agents.semantic_router import SemanticRouter
+from agents.semantic_cache import SemanticCache
+from agents.history_manager import history_manager
 
 # ✅ Initialize agents
 llm = get_llm()
 rag_agent = ResponseGenerator()
 web_agent = WebSearchProcessor()
 guard = LocalGuardrails(llm)
+semantic_router = SemanticRouter() if os.getenv("SEMANTIC_ROUTER", "true").lower() == "true" else None
+
+# ✅ Semantic answer cache for the agents whose answer depends only on the query
+CACHEABLE_AGENTS = ("RAG_AGENT", "WEB_SEARCH_PROCESSOR_AGENT")
+response_cache = SemanticCache() if os.getenv("SEMANTIC_CACHE", "true").lower() == "true" else None
+if response_cache is not None:
+    # RAG answers go stale when the indexed content changes
+    response_cache.register_version("RAG_AGENT", lambda: vector_store.version())
+    # Web answers (including RAG's web fallback) are time-sensitive
+    response_cache.set_ttl("WEB_SEARCH_PROCESSOR_AGENT", float(os.getenv("SEMANTIC_CACHE_WEB_TTL_SECONDS", "3600")))
+
+# Characters of a streamed RAG answer held back until it is clear no web fallback is needed
+RAG_STREAM_HOLDBACK_CHARS = int(os.getenv("RAG_STREAM_HOLDBACK_CHARS", "200"))
+
+# Borderline retrieval starts the web search alongside RAG generation; clearly poor retrieval
+# skips RAG generation and goes straight to the web (see retrieval_confidence)
+SPECULATIVE_WEB_SEARCH = os.getenv("SPECULATIVE_WEB_SEARCH", "true").lower() == "true"
+
+# Run the input guardrail in parallel with routing + the agent call, discarding the agent's work if UNSAFE
+OPTIMISTIC_GUARDRAILS = os.getenv("OPTIMISTIC_GUARDRAILS", "true").lower() == "true"
 
 # ✅ Define shared state
 class GraphState(TypedDict):
@@ -32,13 +57,14 @@ class GraphState(TypedDict):
     input_type: Literal["text", "image"]
     bypass_guardrails: bool
     messages: List[BaseMessage]
+    rag_specialty: Optional[str]  # restrict RAG retrieval to one specialty folder
 
 # ✅ Node 1: Guardrails check
-def guardrails_node(state: GraphState):
+async def guardrails_node(state: GraphState):
     if state["input_type"] == "image":
         return {**state, "bypass_guardrails": True}
 
-    is_safe, result = guard.check_input(state["input"])
+    is_safe, result = await guard.acheck_input(state["input"])
     if not is_safe:
         return {
             **state,
@@ -52,16 +78,13 @@ def guardrails_node(state: GraphState):
     return {**state, "bypass_guardrails": True}
 
 # ✅ Node 2: Image detection stub
-def image_detection_node(state: GraphState):
+async def image_detection_node(state: GraphState):
     if state["input_type"] != "image":
         return state
     return {**state, "image_type": "generic", "agent_name": "IMAGE_ANALYSIS_AGENT"}
 
-# ✅ Node 3: Agent Routing
-def route_to_agent(state: GraphState):
-    if state["agent_name"] == "GUARDRAILS_BLOCK" or state["input_type"] == "image":
-        return state  # already routed in image detection
-
+# ✅ LLM router (fallback for the embedding router, also used by evaluate_router.py)
+async def llm_route(history: List[BaseMessage], user_input: str) -> str:
     prompt = f"""
 You are a decision-making agent that decides which specialist agent should respond to the user's medical query.
 
@@ -70,10 +93,10 @@ List of agents:
 - RAG_AGENT: Retrieves and answers based on a medical document database.
 - WEB_SEARCH_PROCESSOR_AGENT: Searches the web for real-time or uncommon questions.
 
-Given the user's input: \"{state['input']}\", respond ONLY as a JSON object like: {{"agent_name": "RAG_AGENT"}}
+Given the user's input: \"{user_input}\", respond ONLY as a JSON object like: {{"agent_name": "RAG_AGENT"}}
 """
-    memory = state["messages"] + [HumanMessage(content=prompt)]
-    decision = llm.invoke(memory)
+    memory = history_manager.prepare(history, "ROUTER") + [HumanMessage(content=prompt)]
+    decision = await llm.ainvoke(memory)
 
     chosen = "CONVERSATION_AGENT"
     if isinstance(decision, AIMessage):
@@ -83,33 +106,55 @@ Given the user's input: \"{state['input']}\", respond ONLY as a JSON object like
         except json.JSONDecodeError:
             print("⚠️ Invalid JSON from agent_decision:", repr(decision.content))
 
+    return chosen
+
+# ✅ Node 3: Agent Routing
+async def route_to_agent(state: GraphState):
+    if state["agent_name"] == "GUARDRAILS_BLOCK" or state["input_type"] == "image":
+        return state  # already routed in image detection
+
+    # Local embedding router first; the LLM only decides when the margin is too small
+    chosen = None
+    if semantic_router is not None:
+        chosen, _ = await run_sync(semantic_router.route, state["input"], state["messages"])
+    if chosen is None:
+        chosen = await llm_route(state["messages"], state["input"])
+
     return {**state, "agent_name": chosen}
 
 
-def call_agent(state: GraphState):
+async def call_agent(state: GraphState):
+    result, cache_entry = await _call_agent(state)
+    await _cache_store(cache_entry)
+    return result
+
+
+async def _call_agent(state: GraphState):
+    """The agent's answer as (final state, cache entry); the caller decides whether to store it."""
     if state["agent_name"] == "GUARDRAILS_BLOCK":
-        return state
+        return state, None
 
     input_text = state.get("input", "")
     messages = state["messages"] + [HumanMessage(content=input_text)]
     agent = state["agent_name"]
+    sources = []
+
+    cached = await _cache_lookup(state, input_text)
+    if cached:
+        return _finish_state(state, messages, cached["agent"], cached["response"]), None
 
     if agent == "CONVERSATION_AGENT":
-        response = get_medical_response(messages)
+        # Token-budgeted history (rolling summary + recent turns) instead of the full transcript
+        prompt_messages = history_manager.prepare(state["messages"], agent) + [messages[-1]]
+        response = await aget_medical_response(prompt_messages)
         output = response.content
 
     elif agent == "RAG_AGENT":
-        retrieved_docs = retrieve_documents(input_text)
-        result = rag_agent.generate_response(input_text, retrieved_docs)
-        output = result["response"]
-
-        if "insufficient information" in output.lower():
-            fallback = web_agent.process_web_results(input_text)
-            output = fallback.content
-            agent = "WEB_SEARCH_PROCESSOR_AGENT"
+        retrieved_docs = await aretrieve_documents(input_text, specialty=state.get("rag_specialty"))
+        agent, output, sources = await _answer_rag(input_text, retrieved_docs)
 
     elif agent == "WEB_SEARCH_PROCESSOR_AGENT":
-        response = web_agent.process_web_results(input_text)
+        response = await web_agent.aprocess_web_results(input_text)
         output = response.content
 
     elif agent == "IMAGE_ANALYSIS_AGENT":
@@ -117,23 +162,96 @@ def call_agent(state: GraphState):
             if not state.get("image"):
                 output = "❌ No image provided for analysis."
             else:
-                # 🔽 Save uploaded image to temp file
-                temp_filename = f"temp_{uuid.uuid4().hex}.png"
-                with open(temp_filename, "wb") as f:
-                    f.write(state["image"])
-
-                # 🔍 Analyze image using your image agent
-                output = analyze_image(temp_filename)
-
-                # 🧹 Cleanup
-                if os.path.exists(temp_filename):
-                    os.remove(temp_filename)
+                # 🔍 Analyze the uploaded bytes in memory (sync PIL/Groq/Tavily → bounded executor)
+                output = await run_sync(analyze_image, state["image"])
         except Exception as e:
             output = f"❌ Image analysis failed: {str(e)}"
 
     else:
         output = "⚠️ Could not process your request."
 
+    return _finish_state(state, messages, agent, output), (state, input_text, output, sources, agent)
+
+
+def _is_insufficient(output: str) -> bool:
+    return "insufficient information" in output.lower()
+
+
+def _retrieval_confidence(retrieved_docs) -> str:
+    return retrieval_confidence(retrieved_docs) if SPECULATIVE_WEB_SEARCH else "high"
+
+
+async def _answer_rag(input_text: str, retrieved_docs):
+    """
+    RAG answer with the web search fallback; returns (agent, output, sources).
+
+    high       - RAG, then the web only if RAG reports insufficient information (serial)
+    borderline - RAG and the full web pipeline race; the first sufficient answer wins
+    low        - web search only, no RAG generation call
+    """
+    confidence = _retrieval_confidence(retrieved_docs)
+    if confidence == "high":
+        result = await rag_agent.agenerate_response(input_text, retrieved_docs)
+        if not _is_insufficient(result["response"]):
+            return "RAG_AGENT", result["response"], result["sources"]
+
+    if confidence != "borderline":
+        fallback = await web_agent.aprocess_web_results(input_text)
+        return "WEB_SEARCH_PROCESSOR_AGENT", fallback.content, []
+
+    rag_task = asyncio.create_task(rag_agent.agenerate_response(input_text, retrieved_docs))
+    web_task = asyncio.create_task(web_agent.aprocess_web_results(input_text))
+    try:
+        pending = {rag_task, web_task}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if rag_task in done and rag_task.exception() is None and not _is_insufficient(rag_task.result()["response"]):
+                result = rag_task.result()
+                return "RAG_AGENT", result["response"], result["sources"]
+            # A failed web search still waits for a RAG answer that may be sufficient
+            if web_task.done() and (web_task.exception() is None or rag_task.done()):
+                break
+        return "WEB_SEARCH_PROCESSOR_AGENT", web_task.result().content, []
+    finally:
+        rag_task.cancel()
+        web_task.cancel()
+
+
+async def _prefetched_web_results(task):
+    if task is None:
+        return None
+    try:
+        return await task
+    except Exception as e:
+        print(f"⚠️ Speculative web search failed: {e}")
+        return None  # astream_web_results searches again
+
+
+def _is_cacheable(state: GraphState) -> bool:
+    # Answers scoped to a specialty must not be served for unscoped questions (and vice versa)
+    return response_cache is not None and state["agent_name"] in CACHEABLE_AGENTS and not state.get("rag_specialty")
+
+
+async def _cache_lookup(state: GraphState, input_text: str):
+    if not _is_cacheable(state):
+        return None
+    return await run_sync(response_cache.lookup, state["agent_name"], input_text)
+
+
+async def _cache_store(cache_entry: Optional[tuple]):
+    """Store a (state, input_text, output, sources, agent) entry; None stores nothing."""
+    if cache_entry is None:
+        return
+    state, input_text, output, sources, agent = cache_entry
+    if not _is_cacheable(state):
+        return
+    routed_agent = state["agent_name"]
+    if not output or output.startswith(ResponseGenerator.ERROR_MESSAGE):
+        return
+    await run_sync(response_cache.store, routed_agent, input_text, output, sources, agent)
+
+
+def _finish_state(state: GraphState, messages: List[BaseMessage], agent: str, output: str):
     messages.append(AIMessage(content=output))
     updated_agents = state.get("involved_agents", []) + [agent]
 
@@ -146,21 +264,239 @@ def call_agent(state: GraphState):
     }
 
 
-# ✅ Build the graph
-def build_medical_agent_graph():
-    builder = StateGraph(GraphState)
+# ✅ Optimistic dispatch: guardrails, routing and the agent call race; UNSAFE cancels the agent.
+# The answer is cached only once the guardrail has returned SAFE.
+async def _route_and_call(state: GraphState):
+    return await _call_agent(await route_to_agent(state))
+
+
+async def _cancel(task: asyncio.Task):
+    """Cancel a speculative task and wait for it, so its failure (if any) is consumed."""
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError, Exception):
+        await task
+
+
+async def optimistic_dispatch_node(state: GraphState):
+    if state["input_type"] == "image":
+        result, cache_entry = await _route_and_call({**state, "bypass_guardrails": True})
+        await _cache_store(cache_entry)
+        return result
+
+    agent_task = asyncio.create_task(_route_and_call(state))
+    try:
+        guarded = await guardrails_node(state)
+    except BaseException:
+        await _cancel(agent_task)
+        raise
+
+    if guarded["agent_name"] == "GUARDRAILS_BLOCK":
+        await _cancel(agent_task)
+        return guarded
+
+    result, cache_entry = await agent_task
+    await _cache_store(cache_entry)
+    return {**result, "bypass_guardrails": True}
+
+
+# ✅ Streaming counterpart of call_agent (state must already be routed by medical_routing_graph)
+async def astream_call_agent(state: GraphState, defer_cache_store: bool = False):
+    """
+    Streams the chosen agent's answer as it is generated.
+
+    With defer_cache_store the answer is not cached here; the done event carries a
+    "cache_entry" for _cache_store once the caller knows the input was safe.
+
+    RAG turns follow call_agent's confidence tiers, except that a borderline retrieval only
+    prefetches the web results (rewrite + search) while RAG streams, so a fallback pays for
+    the summary alone.
+
+    Yields events:
+        {"type": "token", "content": str}  - next piece of the answer
+        {"type": "reset"}                  - discard what was streamed so far (RAG fell back to web search)
+        {"type": "done", "state": dict}    - final graph state, same shape as call_agent's output
+    """
+    if state["agent_name"] == "GUARDRAILS_BLOCK":
+        yield {"type": "token", "content": state["response"]}
+        yield {"type": "done", "state": state}
+        return
+
+    input_text = state.get("input", "")
+    messages = state["messages"] + [HumanMessage(content=input_text)]
+    agent = state["agent_name"]
+    parts = []
+    sources = []
+
+    cached = await _cache_lookup(state, input_text)
+    if cached:
+        yield {"type": "token", "content": cached["response"]}
+        yield {"type": "done", "state": _finish_state(state, messages, cached["agent"], cached["response"])}
+        return
+
+    if agent == "CONVERSATION_AGENT":
+        prompt_messages = history_manager.prepare(state["messages"], agent) + [messages[-1]]
+        async for token in astream_medical_response(prompt_messages):
+            parts.append(token)
+            yield {"type": "token", "content": token}
+
+    elif agent == "RAG_AGENT":
+        retrieved_docs = await aretrieve_documents(input_text, specialty=state.get("rag_specialty"))
+        confidence = _retrieval_confidence(retrieved_docs)
+        web_prefetch = asyncio.create_task(web_agent.asearch(input_text)) if confidence == "borderline" else None
+
+        try:
+            insufficient = confidence == "low"  # nothing relevant indexed: skip RAG generation
+            if not insufficient:
+                sources = rag_agent.get_sources(retrieved_docs)
+
+                # Hold back the first characters: an "insufficient information" answer is
+                # replaced by the web fallback and should never reach the user.
+                held, streaming = "", False
+                async for token in rag_agent.astream_response(input_text, retrieved_docs):
+                    parts.append(token)
+                    if streaming:
+                        yield {"type": "token", "content": token}
+                        continue
+                    held += token
+                    if len(held) >= RAG_STREAM_HOLDBACK_CHARS and not _is_insufficient(held):
+                        streaming = True
+                        yield {"type": "token", "content": held}
+
+                insufficient = _is_insufficient("".join(parts))
+                if insufficient and streaming:
+                    yield {"type": "reset"}
+                elif not insufficient and not streaming and held:
+                    yield {"type": "token", "content": held}
+
+            if insufficient:
+                parts = []
+                sources = []
+                agent = "WEB_SEARCH_PROCESSOR_AGENT"
+                web_results = await _prefetched_web_results(web_prefetch)
+                async for token in web_agent.astream_web_results(input_text, web_results=web_results):
+                    parts.append(token)
+                    yield {"type": "token", "content": token}
+        finally:
+            if web_prefetch is not None:
+                web_prefetch.cancel()
+
+    elif agent == "WEB_SEARCH_PROCESSOR_AGENT":
+        async for token in web_agent.astream_web_results(input_text):
+            parts.append(token)
+            yield {"type": "token", "content": token}
+
+    elif agent == "IMAGE_ANALYSIS_AGENT":
+        if not state.get("image"):
+            parts.append("❌ No image provided for analysis.")
+            yield {"type": "token", "content": parts[-1]}
+        else:
+            async for token in astream_analyze_image(state["image"]):
+                parts.append(token)
+                yield {"type": "token", "content": token}
+
+    else:
+        parts.append("⚠️ Could not process your request.")
+        yield {"type": "token", "content": parts[-1]}
+
+    output = "".join(parts)
+    cache_entry = (state, input_text, output, sources, agent)
+    if defer_cache_store:
+        yield {"type": "done", "state": _finish_state(state, messages, agent, output), "cache_entry": cache_entry}
+        return
+    await _cache_store(cache_entry)
+    yield {"type": "done", "state": _finish_state(state, messages, agent, output)}
+
+
+# ✅ Streaming entry point: guardrails + routing + agent, honouring the optimistic mode
+async def astream_agent_response(state: GraphState):
+    """
+    Streams a full turn for the SSE endpoints.
+
+    Yields an {"type": "agent", "agent_name": str} event once routing is known, then the
+    events of astream_call_agent. In optimistic mode the agent starts streaming into a buffer
+    while the input guardrail runs; nothing is released until the guardrail returns SAFE.
+    """
+    if not OPTIMISTIC_GUARDRAILS or state["input_type"] == "image":
+        routed = await medical_routing_graph.ainvoke(state)
+        yield {"type": "agent", "agent_name": routed["agent_name"]}
+        async for event in astream_call_agent(routed):
+            yield event
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            routed = await route_to_agent(await image_detection_node(state))
+            await queue.put({"type": "agent", "agent_name": routed["agent_name"]})
+            async for event in astream_call_agent(routed, defer_cache_store=True):
+                await queue.put(event)
+        except Exception as e:
+            await queue.put({"type": "error", "error": e})
+
+    producer = asyncio.create_task(produce())
+    try:
+        guarded = await guardrails_node(state)
+        if guarded["agent_name"] == "GUARDRAILS_BLOCK":
+            await _cancel(producer)
+            yield {"type": "agent", "agent_name": "GUARDRAILS_BLOCK"}
+            async for event in astream_call_agent(guarded):
+                yield event
+            return
+
+        while True:
+            event = await queue.get()
+            if event["type"] == "error":
+                raise event["error"]
+            if event["type"] == "done":
+                await _cache_store(event.get("cache_entry"))
+                yield {"type": "done", "state": {**event["state"], "bypass_guardrails": True}}
+                return
+            yield event
+    finally:
+        # Blocked input, failure or client disconnect: stop the speculative agent work
+        await _cancel(producer)
+
+
+# ✅ Build the graph (nodes are async: run it with ainvoke)
+def _add_routing_nodes(builder: StateGraph):
     builder.add_node("Guardrails", guardrails_node)
     builder.add_node("ImageDetection", image_detection_node)
     builder.add_node("RouteAgent", route_to_agent)
-    builder.add_node("CallAgent", call_agent)
 
     builder.set_entry_point("Guardrails")
     builder.add_edge("Guardrails", "ImageDetection")
     builder.add_edge("ImageDetection", "RouteAgent")
+
+
+def build_medical_agent_graph():
+    builder = StateGraph(GraphState)
+    if OPTIMISTIC_GUARDRAILS:
+        builder.add_node("ImageDetection", image_detection_node)
+        builder.add_node("OptimisticDispatch", optimistic_dispatch_node)
+
+        builder.set_entry_point("ImageDetection")
+        builder.add_edge("ImageDetection", "OptimisticDispatch")
+        builder.add_edge("OptimisticDispatch", END)
+        return builder.compile()
+
+    _add_routing_nodes(builder)
+    builder.add_node("CallAgent", call_agent)
+
     builder.add_edge("RouteAgent", "CallAgent")
     builder.add_edge("CallAgent", END)
 
     return builder.compile()
 
-# ✅ Compile the final graph
+
+# ✅ Routing-only graph for the streaming endpoints: the agent call is streamed by astream_call_agent
+def build_medical_routing_graph():
+    builder = StateGraph(GraphState)
+    _add_routing_nodes(builder)
+    builder.add_edge("RouteAgent", END)
+
+    return builder.compile()
+
+# ✅ Compile the final graphs
 medical_agent_graph = build_medical_agent_graph()
+medical_routing_graph = build_medical_routing_graph()
@@ -0,0 +1,34 @@
+# agents/async_utils.py
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# ✅ Bounded pool for the pieces that have no async API (Chroma, PIL, sentence-transformers)
+AGENT_EXECUTOR_WORKERS = int(os.getenv("AGENT_EXECUTOR_WORKERS", "16"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=AGENT_EXECUTOR_WORKERS,
+    thread_name_prefix="agent-sync",
+)
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Run a blocking callable on the shared bounded executor so it never stalls the event loop.
+
+    Args:
+        func: The synchronous callable to run
+        *args, **kwargs: Arguments forwarded to the callable
+
+    Returns:
+        Whatever the callable returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    """Release the worker threads (called on application shutdown)."""
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,225 @@
+# agents/embedding_service.py
+#
+# Shared embedding front-end for the query path (retriever, semantic cache, router,
+# safety classifier) and for ingestion:
+#   - query embeddings are kept in an in-memory LRU cache, so the same user text is
+#     embedded once per turn instead of once per component;
+#   - cache misses from concurrent requests are micro-batched: a dedicated worker thread
+#     collects them for EMBEDDING_BATCH_WINDOW_MS and runs one forward pass;
+#   - document embeddings can be kept in a SQLite file (EMBEDDING_DISK_CACHE), so
+#     re-indexing unchanged chunks (--rebuild, profile changes) skips the model.
+
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from agents.llm_loader import get_embedding_model, EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME
+
+
+class EmbeddingDiskCache:
+    """
+    Persistent text -> embedding store (float32 blobs in SQLite), keyed on a hash of
+    the model name, backend and text so a model change never serves stale vectors.
+    """
+
+    def __init__(self, path: str, model_name: str = f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_BACKEND}"):
+        self.path = path
+        self.model_name = model_name
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        keys = {self._key(text): text for text in texts}
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            for start in range(0, len(key_list), 500):  # stay under SQLite's parameter limit
+                chunk = key_list[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[keys[key]] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        rows = [(self._key(text), np.asarray(vector, dtype=np.float32).tobytes()) for text, vector in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingService:
+    """
+    LangChain-style embed_query/embed_documents with caching and micro-batching.
+
+    Queries go through the LRU cache and the batching worker; documents (large,
+    already-batched ingestion calls) go straight to the model, through the disk cache
+    when one is configured.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = None,
+        batch_window_ms: float = None,
+        max_batch_size: int = None,
+        torch_threads: int = None,
+        disk_cache_path: Optional[str] = None,
+    ):
+        self.cache_size = cache_size or int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+        self.batch_window = (batch_window_ms if batch_window_ms is not None else float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "4"))) / 1000
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+        self.torch_threads = torch_threads or int(os.getenv("EMBEDDING_TORCH_THREADS", "0")) or None
+        disk_cache_path = disk_cache_path if disk_cache_path is not None else os.getenv("EMBEDDING_DISK_CACHE", "")
+        self.disk_cache = EmbeddingDiskCache(disk_cache_path) if disk_cache_path else None
+
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._pending: Dict[str, Future] = {}  # texts queued or being embedded, shared by concurrent callers
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker = None
+        self._threads_configured = False
+        self.stats = {
+            "query_cache_hits": 0, "query_cache_misses": 0, "joined_in_flight": 0,
+            "batches": 0, "batched_texts": 0, "max_batch": 0,
+            "document_texts": 0, "disk_cache_hits": 0,
+        }
+
+    def name(self):
+        return EMBEDDING_MODEL_NAME
+
+    def warm_up(self):
+        self.embed_query("warm up")
+
+    # --- queries ---------------------------------------------------------
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings for texts, from the LRU cache or one shared forward pass per batch window."""
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        waiting: Dict[str, Future] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                vector = self._cache.get(text)
+                if vector is not None:
+                    self._cache.move_to_end(text)
+                    results[i] = vector
+                    self.stats["query_cache_hits"] += 1
+                elif text not in waiting:
+                    future = self._pending.get(text)
+                    if future is None:
+                        future = self._pending[text] = Future()
+                        self._queue.put((text, future))
+                        self.stats["query_cache_misses"] += 1
+                    else:
+                        self.stats["joined_in_flight"] += 1
+                    waiting[text] = future
+            if waiting:
+                self._ensure_worker()
+
+        vectors = {text: future.result() for text, future in waiting.items()}
+        return [(vector if vector is not None else vectors[text]).tolist() for text, vector in zip(texts, results)]
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                # Inside the try: a model that fails to load fails this batch's callers, not the worker
+                self._configure_threads()
+                vectors = np.asarray(get_embedding_model().embed_documents(texts), dtype=np.float32)
+            except Exception as e:
+                with self._lock:
+                    for text, _ in batch:
+                        self._pending.pop(text, None)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._lock:
+                for text, vector in zip(texts, vectors):
+                    self._cache[text] = vector
+                    self._pending.pop(text, None)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                self.stats["batches"] += 1
+                self.stats["batched_texts"] += len(texts)
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(texts))
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    # --- documents -------------------------------------------------------
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of documents directly, reusing vectors from the disk cache when configured."""
+        self.stats["document_texts"] += len(texts)
+        cached = self.disk_cache.get_many(texts) if self.disk_cache is not None else {}
+        self.stats["disk_cache_hits"] += len(cached)
+
+        missing = list(dict.fromkeys(text for text in texts if text not in cached))
+        if missing:
+            self._configure_threads()
+            vectors = np.asarray(get_embedding_model().embed_documents(missing), dtype=np.float32)
+            computed = dict(zip(missing, vectors))
+            if self.disk_cache is not None:
+                self.disk_cache.put_many(computed)
+            cached.update(computed)
+        return [cached[text].tolist() for text in texts]
+
+    def _configure_threads(self):
+        # torch's intra-op pool is process-wide; set it once, before the first forward pass
+        # (the onnx backends size their own session with EMBEDDING_ONNX_THREADS)
+        if self._threads_configured or not self.torch_threads or EMBEDDING_BACKEND != "torch":
+            return
+        import torch
+
+        torch.set_num_threads(self.torch_threads)
+        self._threads_configured = True
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.stats["query_cache_hits"] + self.stats["query_cache_misses"]
+            return {
+                **self.stats,
+                "query_cache_hit_rate": self.stats["query_cache_hits"] / lookups if lookups else 0.0,
+                "mean_batch": self.stats["batched_texts"] / self.stats["batches"] if self.stats["batches"] else 0.0,
+                "cached_queries": len(self._cache),
+                "disk_cache_entries": len(self.disk_cache) if self.disk_cache is not None else None,
+            }
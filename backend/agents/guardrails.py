@@ -2,14 +2,21 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.messages import HumanMessage, AIMessage
+from agents.safety_classifier import FastSafetyClassifier, GuardrailStats
+from agents.async_utils import run_sync
+import os
 
 # LangChain Guardrails
 class LocalGuardrails:
     """Guardrails implementation using purely local components with LangChain."""
 
-    def __init__(self, llm):
-        """Initialize guardrails with the provided LLM."""
+    def __init__(self, llm, fast_classifier: FastSafetyClassifier = None):
+        """Initialize guardrails with the provided LLM and an optional in-process first tier."""
         self.llm = llm
+        if fast_classifier is None and os.getenv("GUARD_FAST_PATH", "true").lower() == "true":
+            fast_classifier = FastSafetyClassifier()
+        self.fast_classifier = fast_classifier
+        self.stats = GuardrailStats()
 
         # Input guardrails prompt
         self.input_check_prompt = PromptTemplate.from_template(
@@ -123,12 +130,56 @@ class LocalGuardrails:
         Returns:
             Tuple of (is_allowed, message)
         """
+        if self.fast_classifier:
+            for tier, classify in (("rules", self.fast_classifier.classify_rules),
+                                   ("embedding", self.fast_classifier.classify_embedding)):
+                verdict, reason = classify(user_input)
+                if verdict is not None:
+                    return self._fast_result(tier, verdict, reason, user_input)
+
         result = self.input_guardrail_chain.invoke({"input": user_input})
+        return self._parse_input_result(result, user_input)
+
+    async def acheck_input(self, user_input: str) -> tuple[bool, str]:
+        """
+        Async variant of check_input that awaits the LLM without blocking the event loop.
+
+        Args:
+            user_input: The raw user input text
+
+        Returns:
+            Tuple of (is_allowed, message)
+        """
+        if self.fast_classifier:
+            verdict, reason = self.fast_classifier.classify_rules(user_input)
+            if verdict is not None:
+                return self._fast_result("rules", verdict, reason, user_input)
+
+            # Embedding forward pass is CPU work: keep it off the event loop
+            verdict, reason = await run_sync(self.fast_classifier.classify_embedding, user_input)
+            if verdict is not None:
+                return self._fast_result("embedding", verdict, reason, user_input)
+
+        result = await self.input_guardrail_chain.ainvoke({"input": user_input})
+        return self._parse_input_result(result, user_input)
+
+    def get_stats(self) -> dict:
+        """Fraction of inputs resolved by each tier (rules, embedding, llm)."""
+        return self.stats.snapshot()
+
+    def _fast_result(self, tier: str, is_safe: bool, reason: str, user_input: str):
+        self.stats.record(tier, is_safe)
+        if not is_safe:
+            return False, AIMessage(content = f"I cannot process this request. Reason: {reason}")
+        return True, user_input
 
+    def _parse_input_result(self, result: str, user_input: str):
         if result.startswith("UNSAFE"):
+            self.stats.record("llm", False)
             reason = result.split(":", 1)[1].strip() if ":" in result else "Content policy violation"
             return False, AIMessage(content = f"I cannot process this request. Reason: {reason}")
 
+        self.stats.record("llm", True)
         return True, user_input
 
     def check_output(self, output: str, user_input: str = "") -> str:
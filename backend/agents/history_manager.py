@@ -0,0 +1,174 @@
+# agents/history_manager.py
+
+import asyncio
+import os
+import re
+from typing import Any, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from agents.async_utils import run_sync
+from agents.llm_loader import get_llm
+from agents.token_utils import count_tokens
+
+SUMMARY_MARKER = "history_summary"
+
+# Token budget for the history each consumer receives (the current user input is extra)
+DEFAULT_BUDGETS = {
+    "ROUTER": 400,
+    "CONVERSATION_AGENT": 3000,
+}
+
+
+# Follow-ups that only make sense with the previous question: they open with "what about",
+# "and"/"also", or a question word followed by a pronoun ("does it ...", "how are they ...")
+_FOLLOW_UP = re.compile(
+    r"^\s*(?:(?:and|so)\s+)?(?:what|how)\s+about\b|^\s*(?:and|also)\b|"
+    r"^\s*(?:(?:and|so)\s+)?(?:(?:is|are|does|do|did|can|could|should|will|would|was|were|how|why|what|when|where)\s+){1,2}"
+    r"(?:it|its|this|that|they|them|their|these|those)\b",
+    re.IGNORECASE,
+)
+
+
+def is_follow_up(text: str) -> bool:
+    return bool(_FOLLOW_UP.search(text))
+
+
+def last_user_message(messages: Optional[List[Any]]) -> Optional[str]:
+    # History as LangChain messages or [{"role", "content"}] dicts
+    for message in reversed(messages or []):
+        if isinstance(message, dict):
+            if message.get("role") in ("user", "human"):
+                return message.get("content")
+        elif getattr(message, "type", None) == "human":
+            return message.content
+    return None
+
+
+def message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + 4  # role/formatting overhead
+
+
+def is_summary(message: BaseMessage) -> bool:
+    return isinstance(message, SystemMessage) and message.additional_kwargs.get(SUMMARY_MARKER, False)
+
+
+class HistoryManager:
+    """
+    Keeps prompt size flat as conversations grow.
+
+    prepare() trims the stored history to a per-consumer token budget, newest turns first,
+    with the rolling summary in front. compact_session() runs in the background after a turn
+    and folds everything older than the last N turns into that summary.
+    """
+
+    def __init__(self, keep_last_turns: Optional[int] = None, compact_threshold_tokens: Optional[int] = None):
+        self.keep_last_turns = keep_last_turns if keep_last_turns is not None else int(os.getenv("HISTORY_KEEP_TURNS", "6"))
+        self.compact_threshold_tokens = (
+            compact_threshold_tokens if compact_threshold_tokens is not None
+            else int(os.getenv("HISTORY_COMPACT_TOKENS", "1500"))
+        )
+        self.budgets = {
+            name: int(os.getenv(f"HISTORY_BUDGET_{name}", str(default)))
+            for name, default in DEFAULT_BUDGETS.items()
+        }
+        self._compacting = set()
+
+    def prepare(self, messages: List[BaseMessage], consumer: str) -> List[BaseMessage]:
+        """
+        Rolling summary first, then the most recent messages that fit the rest of the
+        consumer's token budget. The summary's tokens are reserved up front: in a long
+        session it is the only record of the older turns.
+        """
+        budget = self.budgets.get(consumer, self.budgets["CONVERSATION_AGENT"])
+        summary = messages[0] if messages and is_summary(messages[0]) else None
+        body = messages[1:] if summary else messages
+        if summary and message_tokens(summary) > budget:
+            summary = None  # a summary larger than the whole budget is left out
+
+        selected, used = [], message_tokens(summary) if summary else 0
+        for message in reversed(body):
+            tokens = message_tokens(message)
+            if used + tokens > budget:
+                break
+            selected.append(message)
+            used += tokens
+        selected.reverse()
+
+        if summary:
+            selected.insert(0, summary)
+        return selected
+
+    async def compact_session(self, session_id: str, store):
+        """
+        Fold turns older than the last keep_last_turns into the rolling summary and save it.
+        Safe to fire and forget: concurrent turns for the session are preserved.
+        """
+        if session_id in self._compacting:
+            return
+        self._compacting.add(session_id)
+        try:
+            snapshot = await run_sync(store.get, session_id)
+            summary = snapshot[0] if snapshot and is_summary(snapshot[0]) else None
+            body = snapshot[1:] if summary else snapshot
+
+            keep = self.keep_last_turns * 2
+            folded = body[:-keep] if len(body) > keep else []
+            if sum(message_tokens(m) for m in folded) < self.compact_threshold_tokens:
+                return
+
+            new_summary = await self._summarize(summary, folded)
+            prefix_length = len(snapshot) - (len(body) - len(folded))
+
+            # Re-read: a new turn may have been saved while the LLM was summarizing
+            latest = await run_sync(store.get, session_id)
+            if not _same_prefix(latest, snapshot[:prefix_length]):
+                return
+            await run_sync(store.set, session_id, [new_summary] + latest[prefix_length:])
+        except Exception as e:
+            print(f"[HistoryManager Error] {e}")
+        finally:
+            self._compacting.discard(session_id)
+
+    async def _summarize(self, summary: Optional[BaseMessage], folded: List[BaseMessage]) -> SystemMessage:
+        transcript = "\n".join(
+            f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}"
+            for m in folded
+            if isinstance(m, (HumanMessage, AIMessage))
+        )
+        previous = summary.content if summary else "(none)"
+        prompt = f"""You maintain a running summary of a conversation between a user and a medical assistant.
+
+Current summary:
+{previous}
+
+New conversation turns to fold into the summary:
+{transcript}
+
+Write the updated summary in at most 200 words. Keep the user's symptoms, conditions, medications,
+stated facts and open questions; drop greetings and repeated explanations. Return only the summary."""
+
+        result = await get_llm().ainvoke(prompt)
+        return SystemMessage(
+            content=f"Summary of the earlier conversation: {result.content.strip()}",
+            additional_kwargs={SUMMARY_MARKER: True},
+        )
+
+
+def _same_prefix(messages: List[BaseMessage], prefix: List[BaseMessage]) -> bool:
+    if len(messages) < len(prefix):
+        return False
+    return all(a.type == b.type and a.content == b.content for a, b in zip(messages, prefix))
+
+
+history_manager = HistoryManager()
+_background_tasks = set()
+
+
+def schedule_compaction(session_id: str, store):
+    """Start background compaction for a session without delaying the response."""
+    task = asyncio.create_task(history_manager.compact_session(session_id, store))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
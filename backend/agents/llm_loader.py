@@ -1,6 +1,14 @@
 # agents/llm_loader.py
+#
+# Process-wide model/client registry. Every ChatGroq client, the embedding model and
+# its caching/batching service, the reranker, the vision client and the Tavily tool are
+# created once, lazily, on first use and shared by all agents. Groq clients share one pair of pooled HTTP clients.
 
 import os
+import threading
+import time
+
+import httpx
 from langchain_groq import ChatGroq
 
 from langchain_huggingface import HuggingFaceEmbeddings
@@ -8,28 +16,127 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_llm():
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx | onnx-int8
+RERANKER_MODEL_NAME = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+_registry = {}
+_registry_lock = threading.RLock()
+
+
+def _get_or_create(key, factory):
+    """Return the registered instance for key, creating it once (thread-safe)."""
+    instance = _registry.get(key)
+    if instance is not None:
+        return instance
+
+    with _registry_lock:
+        instance = _registry.get(key)
+        if instance is None:
+            start = time.perf_counter()
+            instance = factory()
+            _registry[key] = instance
+            print(f"✅ Loaded {key[0]} {key[1:]} in {time.perf_counter() - start:.2f}s")
+        return instance
+
+
+def _get_http_clients():
+    """Pooled sync/async HTTP clients shared by every Groq client."""
+    def create():
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+        )
+        timeout = float(os.getenv("GROQ_TIMEOUT", "60"))
+        return httpx.Client(limits=limits, timeout=timeout), httpx.AsyncClient(limits=limits, timeout=timeout)
+
+    return _get_or_create(("http_clients",), create)
+
+
+def get_llm(model_name: str = None, temperature: float = None):
     """
     Loads the default LLM (Groq-based Mixtral/LLama3) using the Groq API key from the .env file.
+    Instances are shared per (model, temperature).
     """
-    groq_api_key = os.getenv("GROQ_API_KEY")
-    model_name = os.getenv("LLM_MODEL_NAME", "llama-3.3-70b-versatile")  # or llama3-70b-8192
-    
-    if not groq_api_key:
-        raise ValueError("❌ GROQ_API_KEY not found in .env file.")
-    
-    llm = ChatGroq(
-        groq_api_key=groq_api_key,
-        model_name=model_name
-    )
-    return llm
+    model_name = model_name or os.getenv("LLM_MODEL_NAME", "llama-3.3-70b-versatile")  # or llama3-70b-8192
+
+    def create():
+        groq_api_key = os.getenv("GROQ_API_KEY")
+        if not groq_api_key:
+            raise ValueError("❌ GROQ_API_KEY not found in .env file.")
+
+        http_client, http_async_client = _get_http_clients()
+        kwargs = {"temperature": temperature} if temperature is not None else {}
+        return ChatGroq(
+            groq_api_key=groq_api_key,
+            model_name=model_name,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            **kwargs
+        )
+
+    return _get_or_create(("llm", model_name, temperature), create)
+
+
+def get_vision_llm():
+    """
+    Loads the Groq vision model used by the image analysis agent.
+    """
+    model_name = os.getenv("VISION_MODEL_NAME", "meta-llama/llama-4-scout-17b-16e-instruct")
+    return get_llm(model_name=model_name, temperature=0.3)
+
 
 class NamedHuggingFaceEmbeddings(HuggingFaceEmbeddings):
     def name(self):
-        return "sentence-transformers/all-MiniLM-L6-v2"
+        return EMBEDDING_MODEL_NAME
+
 
-def get_embedding_model():
+def get_embedding_model(backend: str = None):
     """
-    Loads the default sentence embedding model using HuggingFace.
+    Loads the default sentence embedding model (once per process) on the configured backend:
+    torch (HuggingFace/sentence-transformers), or onnx / onnx-int8 (onnxruntime, no torch).
     """
-    return NamedHuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
\ No newline at end of file
+    backend = backend or EMBEDDING_BACKEND
+
+    def create():
+        if backend == "torch":
+            return NamedHuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+        if backend in ("onnx", "onnx-int8"):
+            from agents.onnx_embeddings import OnnxEmbeddings
+
+            return OnnxEmbeddings(EMBEDDING_MODEL_NAME, quantize=backend == "onnx-int8")
+        raise ValueError(f"❌ Unknown EMBEDDING_BACKEND: {backend}")
+
+    return _get_or_create(("embeddings", EMBEDDING_MODEL_NAME, backend), create)
+
+
+def get_embedding_service():
+    """
+    Shared embedding service (query LRU cache + micro-batching, optional disk cache)
+    in front of the embedding model; see agents/embedding_service.py.
+    """
+    from agents.embedding_service import EmbeddingService
+
+    return _get_or_create(("embedding_service", EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND), EmbeddingService)
+
+
+def get_reranker():
+    """
+    Loads the CPU cross-encoder used to rerank retrieved chunks (once per process).
+    """
+    from sentence_transformers import CrossEncoder
+
+    return _get_or_create(
+        ("reranker", RERANKER_MODEL_NAME),
+        lambda: CrossEncoder(RERANKER_MODEL_NAME, max_length=512, device="cpu"),
+    )
+
+
+def get_tavily_search(max_results: int = 5):
+    """
+    Loads the Tavily search tool (uses env var TAVILY_API_KEY).
+    """
+    from langchain_tavily import TavilySearch
+
+    return _get_or_create(("tavily", max_results), lambda: TavilySearch(max_results=max_results))
+
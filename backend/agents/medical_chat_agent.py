@@ -43,10 +43,11 @@ from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from agents.llm_loader import get_llm
 import os
 
-llm = get_llm()
-
-# Load system prompt from external file
-
+# System prompt shared by the sync and async paths
+SYSTEM_PROMPT = (
+    "You are a helpful, ethical medical assistant. Only provide general medical information, "
+    "not specific diagnoses or treatment plans."
+)
 
 
 def get_medical_response(messages: list) -> AIMessage:
@@ -60,10 +61,7 @@ def get_medical_response(messages: list) -> AIMessage:
         AIMessage with the model's response
     """
    
-    full_messages = [SystemMessage(content=(
-    "You are a helpful, ethical medical assistant. Only provide general medical information, "
-    "not specific diagnoses or treatment plans."
-))] + messages
+    full_messages = [SystemMessage(content=SYSTEM_PROMPT)] + messages
     # system_message = SystemMessage(
     #     content=(
     #         "You are a professional, ethical medical assistant. "
@@ -76,9 +74,46 @@ def get_medical_response(messages: list) -> AIMessage:
     # full_messages = [system_message] + messages
 
     try:
-        result = llm.invoke(full_messages)
+        result = get_llm().invoke(full_messages)
+        return AIMessage(content=result.content)
+
+    except Exception as e:
+        print(f"[Medical Agent Error] {e}")
+        return AIMessage(content="⚠️ Sorry, I encountered an issue generating a response.")
+
+
+async def aget_medical_response(messages: list) -> AIMessage:
+    """
+    Async variant of get_medical_response using the LLM's native ainvoke.
+    """
+    full_messages = [SystemMessage(content=SYSTEM_PROMPT)] + messages
+
+    try:
+        result = await get_llm().ainvoke(full_messages)
         return AIMessage(content=result.content)
 
     except Exception as e:
         print(f"[Medical Agent Error] {e}")
         return AIMessage(content="⚠️ Sorry, I encountered an issue generating a response.")
+
+
+async def astream_medical_response(messages: list):
+    """
+    Streams the medical response token by token.
+
+    Args:
+        messages: A list of LangChain BaseMessages including HumanMessage(s) and prior AIMessage(s)
+
+    Yields:
+        Text chunks as the LLM produces them
+    """
+    full_messages = [SystemMessage(content=SYSTEM_PROMPT)] + messages
+
+    try:
+        async for chunk in get_llm().astream(full_messages):
+            if chunk.content:
+                yield chunk.content
+
+    except Exception as e:
+        print(f"[Medical Agent Error] {e}")
+        yield "⚠️ Sorry, I encountered an issue generating a response."
@@ -0,0 +1,102 @@
+# agents/onnx_embeddings.py
+#
+# Torch-free sentence embeddings for CPU-only workers (EMBEDDING_BACKEND=onnx | onnx-int8).
+# Runs the ONNX export of the sentence-transformers model with onnxruntime and the
+# fast tokenizer, then applies the model's mean pooling (and normalization), so the
+# vectors match the PyTorch backend's; check with benchmark_embeddings.py. onnx-int8
+# quantizes the weights (dynamic int8) once and reuses the quantized file.
+
+import json
+import os
+from typing import List
+
+import numpy as np
+
+ONNX_MODEL_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")  # file in the model's Hub repo
+ONNX_CACHE_DIR = os.getenv("EMBEDDING_ONNX_DIR", "models/onnx")  # where the int8 model is written
+
+
+class OnnxEmbeddings:
+    """
+    embed_documents/embed_query (the interface HuggingFaceEmbeddings offers) on onnxruntime.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        quantize: bool = False,
+        max_length: int = None,
+        batch_size: int = 32,
+        threads: int = None,
+    ):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        model_path = hf_hub_download(model_name, ONNX_MODEL_FILE)
+        if quantize:
+            model_path = self._quantized(model_path)
+
+        # Pooling and normalization as configured for the sentence-transformers model
+        modules = self._read_json(hf_hub_download, "modules.json") or []
+        self.normalize = any(module.get("type", "").endswith("Normalize") for module in modules)
+        config = self._read_json(hf_hub_download, "sentence_bert_config.json") or {}
+        max_length = max_length or config.get("max_seq_length", 256)
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(model_name, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_token = "[PAD]" if self.tokenizer.token_to_id("[PAD]") is not None else "<pad>"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+        options = ort.SessionOptions()
+        threads = threads or int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def name(self):
+        return self.model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = [self._embed_batch(texts[start:start + self.batch_size]) for start in range(0, len(texts), self.batch_size)]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0].tolist()
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.asarray([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        vectors = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32)
+
+    def _quantized(self, model_path: str) -> str:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+        quantized_path = os.path.join(ONNX_CACHE_DIR, f"{self.model_name.replace('/', '__')}-int8.onnx")
+        if not os.path.exists(quantized_path):
+            tmp_path = f"{quantized_path}.{os.getpid()}.tmp"
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+            print(f"✅ Quantized {self.model_name} to int8: {quantized_path}")
+        return quantized_path
+
+    def _read_json(self, download, filename: str):
+        try:
+            with open(download(self.model_name, filename), encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None  # not a sentence-transformers repo; plain mean pooling
@@ -1,60 +1,377 @@
 # build_rag_vectorstore_from_dir.py
+#
+# Streaming ingestion: PDF text is extracted and chunked in a process pool (token-aware,
+# structure-aware chunking, see chunker.py), and chunks are embedded and upserted in
+# fixed-size batches as documents arrive, so peak memory stays bounded regardless of
+# corpus size.
+#
+# Indexing is incremental: a manifest next to the collection records each file's content
+# hash, mtime and chunk IDs. Only new or changed files are parsed and embedded, chunks of
+# changed or deleted files are removed, and chunk IDs derive from the content hash and
+# the file's path so re-runs are idempotent and identical copies filed under two
+# specialties stay separate chunks.
+#
+# A BM25 index of the same chunks (sparse_index.py) is updated in the same run: new
+# chunks go into a new segment, removed chunks are marked deleted, and segments are
+# compacted once they pile up.
+#
+# Every chunk carries its file, page, section heading, document hash and specialty
+# (the first sub-folder of the PDF directory, e.g. medical_pdfs/cardiology/...) as
+# metadata, so retrieval can cite sources and filter by document or specialty.
+#
+# Run from the backend directory:
+#   python -m agents.rag_agent.build_rag_vectorstore --pdf-dir medical_pdfs
 
 import os
 os.environ["CHROMA_TELEMETRY_ENABLED"] = "false"
 
+import argparse
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
 from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Chroma
-from agents.llm_loader import get_embedding_model  # your own loader
-
-# === Load all PDFs from a directory ===
-def load_all_pdfs_from_directory(directory_path):
-    all_text = ""
-    for filename in os.listdir(directory_path):
-        if filename.lower().endswith(".pdf"):
-            pdf_path = os.path.join(directory_path, filename)
-            try:
-                reader = PdfReader(pdf_path)
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        all_text += text + "\n"
-                print(f"✅ Loaded: {filename}")
-            except Exception as e:
-                print(f"❌ Failed to read {filename}: {e}")
-    return all_text
-
-# === Split text into chunks ===
-def split_text(text):
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    return splitter.create_documents([text])
+from agents.embedding_service import EmbeddingService
+from agents.rag_agent.chunker import DEFAULT_PROFILE, chunk_document, get_profile
+from agents.rag_agent.sparse_index import BM25Index, sparse_index_directory
+from agents.rag_agent.vector_store import MMAP_DTYPE, MMAP_NLIST, VECTOR_STORE, export_collection, index_version_path, mmap_index_directory
+
+# Same location the retriever reads from (see document_retriever.py)
+CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "agents/rag_agent/rag_db")
+CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "rag_db")
+MANIFEST_FILENAME = "ingest_manifest.json"
+DEFAULT_SPECIALTY = "general"
+
+
+# === Extract and chunk one PDF, page by page (runs in a worker process) ===
+def extract_pdf_pages(pdf_path):
+    pages = []
+    reader = PdfReader(pdf_path)
+    for page_number, page in enumerate(reader.pages, start=1):
+        text = page.extract_text()
+        if text and text.strip():
+            pages.append((page_number, text))
+    return pages
+
+
+def extract_pdf_chunks(pdf_path, profile_name):
+    try:
+        pages = extract_pdf_pages(pdf_path)
+        return pdf_path, len(pages), chunk_document(pages, profile_name), None
+    except Exception as e:
+        return pdf_path, 0, [], str(e)
+
+
+# === List the PDFs of a directory tree (sub-folders are specialties) ===
+def iter_pdf_files(directory_path):
+    for root, dirs, files in os.walk(directory_path):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith(".pdf"):
+                yield os.path.join(root, filename)
+
+
+def specialty_of(relative_path):
+    parts = relative_path.replace(os.sep, "/").split("/")
+    return parts[0] if len(parts) > 1 else DEFAULT_SPECIALTY
+
+
+# === Yield (pdf_path, page_count, chunks) with a bounded number of PDFs in flight ===
+def iter_pdf_chunks(pdf_paths, workers, profile_name, failed=None):
+    pdf_paths = iter(pdf_paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = [pool.submit(extract_pdf_chunks, path, profile_name) for path in islice(pdf_paths, workers * 2)]
+        while in_flight:
+            pdf_path, page_count, chunks, error = in_flight.pop(0).result()
+            next_path = next(pdf_paths, None)
+            if next_path is not None:
+                in_flight.append(pool.submit(extract_pdf_chunks, next_path, profile_name))
+
+            filename = os.path.basename(pdf_path)
+            if error:
+                print(f"❌ Failed to read {filename}: {error}")
+                if failed is not None:
+                    failed.add(pdf_path)
+                continue
+            print(f"✅ Loaded: {filename} ({page_count} pages, {len(chunks)} chunks)")
+            yield pdf_path, page_count, chunks
+
+
+# === Attach IDs and metadata to each chunk ===
+def iter_chunk_records(documents, file_info, stats):
+    for pdf_path, page_count, chunks in documents:
+        stats["pages"] += page_count
+        info = file_info[pdf_path]
+        path_hash = hashlib.sha1(info["source_path"].encode("utf-8")).hexdigest()[:8]
+        index_on_page = {}
+        for page_number, section, text in chunks:
+            index = index_on_page.get(page_number, 0)
+            index_on_page[page_number] = index + 1
+            chunk_id = f"{info['doc_hash'][:16]}-{path_hash}-p{page_number}-c{index}"
+            yield pdf_path, chunk_id, text, {
+                "source": os.path.basename(pdf_path),
+                "source_path": info["source_path"],
+                "page": page_number,
+                "section": section,
+                "doc_hash": info["doc_hash"],
+                "specialty": info["specialty"],
+            }
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# === Manifest: {relative path: {hash, mtime, size, profile, chunk_ids}} per collection ===
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_path(persist_directory, collection_name):
+    return os.path.join(persist_directory, f"{collection_name}_{MANIFEST_FILENAME}")
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("files", {})
+
+
+def save_manifest(path, files):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "files": files}, f)
+    os.replace(tmp_path, path)
+
+
+def save_index_version(path, files):
+    """
+    Digest of every indexed file's content and chunk IDs; the response cache drops RAG
+    answers when it changes (a corrected guideline can keep the same chunk count).
+    """
+    digest = hashlib.sha256(json.dumps(sorted(
+        (key, entry["hash"], entry.get("profile"), entry["chunk_ids"]) for key, entry in files.items()
+    )).encode("utf-8")).hexdigest()[:16]
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            if f.read().strip() == digest:
+                return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(digest)
+    os.replace(tmp_path, path)
+
+
+def plan_changes(pdf_dir, manifest, profile_name):
+    """
+    Compare the directory with the manifest. Files whose mtime and size are unchanged are
+    not re-hashed; files chunked with another profile are re-indexed.
+    Returns (to_index {path: (key, hash, stat)}, stale chunk IDs, unchanged count).
+    """
+    to_index, stale_ids, unchanged, seen = {}, [], 0, set()
+    for pdf_path in iter_pdf_files(pdf_dir):
+        key = os.path.relpath(pdf_path, pdf_dir)
+        seen.add(key)
+        stat = os.stat(pdf_path)
+        entry = manifest.get(key)
+        if entry and entry.get("profile") != profile_name:
+            stale_ids.extend(entry["chunk_ids"])
+            to_index[pdf_path] = (key, file_hash(pdf_path), stat)
+            continue
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            unchanged += 1
+            continue
+
+        digest = file_hash(pdf_path)
+        if entry and entry["hash"] == digest:
+            entry.update(mtime=stat.st_mtime, size=stat.st_size)  # touched, same content
+            unchanged += 1
+            continue
+        if entry:
+            stale_ids.extend(entry["chunk_ids"])
+        to_index[pdf_path] = (key, digest, stat)
+
+    for key in set(manifest) - seen:
+        print(f"🗑️ Removed: {key}")
+        stale_ids.extend(manifest.pop(key)["chunk_ids"])
+    return to_index, stale_ids, unchanged
+
+
+def get_collection(persist_directory, collection_name):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=persist_directory)
+    return client.get_or_create_collection(name=collection_name)
+
+
+# === Index chunks already in the collection (sparse index missing or lost) ===
+def index_collection(collection, sparse_index, page_size=5000):
+    writer = sparse_index.writer()
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for chunk_id, text in zip(page["ids"], page["documents"]):
+            writer.add(chunk_id, text or "")
+        offset += len(page["ids"])
+    writer.flush()
+    return offset
+
 
 # === Build and persist vectorstore ===
-def create_vectorstore_from_directory(pdf_dir, persist_directory="./rag_db"):
+def create_vectorstore_from_directory(
+    pdf_dir,
+    persist_directory=CHROMA_PERSIST_DIRECTORY,
+    collection_name=CHROMA_COLLECTION_NAME,
+    batch_size=64,
+    workers=None,
+    rebuild=False,
+    profile=DEFAULT_PROFILE,
+    embedding_cache=None,
+):
     print("📂 Reading PDF files from:", pdf_dir)
-    combined_text = load_all_pdfs_from_directory(pdf_dir)
-    
-    if not combined_text.strip():
-        print("❌ No valid text extracted from PDFs.")
+    profile_name = get_profile(profile).name
+    workers = workers or os.cpu_count() or 1
+    collection = get_collection(persist_directory, collection_name)
+    manifest_file = manifest_path(persist_directory, collection_name)
+    manifest = {} if rebuild else load_manifest(manifest_file)
+    sparse_dir = sparse_index_directory(persist_directory, collection_name)
+    sparse_existed = BM25Index.exists(sparse_dir)
+    sparse_index = BM25Index(sparse_dir)
+    if not rebuild and not manifest and collection.count():
+        print("⚠️ Collection has chunks not tracked by a manifest; run with --rebuild to avoid duplicates")
+    if rebuild and collection.count():
+        print("♻️ Rebuilding: clearing the existing collection")
+        for ids in batched(collection.get(include=[])["ids"], 5000):
+            collection.delete(ids=ids)
+    if rebuild:
+        sparse_index.clear()
+
+    to_index, stale_ids, unchanged = plan_changes(pdf_dir, manifest, profile_name)
+    print(f"🔍 {len(to_index)} new or changed, {unchanged} unchanged, {len(stale_ids)} stale chunks to remove")
+    for ids in batched(stale_ids, 5000):
+        collection.delete(ids=ids)
+    sparse_index.delete(stale_ids)
+    if not sparse_existed and not rebuild and collection.count():
+        print(f"📚 Built BM25 index for {index_collection(collection, sparse_index)} existing chunks")
+
+    if not to_index:
+        _compact_if_needed(sparse_index)
+        save_manifest(manifest_file, manifest)
+        save_index_version(index_version_path(persist_directory, collection_name), manifest)
+        print("✅ Vector DB is up to date.")
         return
-    
-    print("✂️ Splitting text into chunks...")
-    documents = split_text(combined_text)
-    
+
+    # Unchanged chunk texts re-indexed with --rebuild reuse their vectors from the disk cache
+    embedding = EmbeddingService(disk_cache_path=embedding_cache)
+    file_info = {
+        path: {"doc_hash": digest, "source_path": key.replace(os.sep, "/"), "specialty": specialty_of(key)}
+        for path, (key, digest, _) in to_index.items()
+    }
+    chunk_ids = {path: [] for path in to_index}
+    failed = set()
+
+    stats = {"pages": 0}
+    start = time.perf_counter()
+    total_chunks = 0
+    documents = iter_pdf_chunks(list(to_index), workers, profile_name, failed)
+    chunks = iter_chunk_records(documents, file_info, stats)
+    sparse_writer = sparse_index.writer()
+
     print("📌 Embedding and storing in Chroma DB...")
-    embedding = get_embedding_model()
+    for batch in batched(chunks, batch_size):
+        texts = [text for _, _, text, _ in batch]
+        collection.upsert(
+            ids=[chunk_id for _, chunk_id, _, _ in batch],
+            embeddings=embedding.embed_documents(texts),
+            documents=texts,
+            metadatas=[metadata for _, _, _, metadata in batch],
+        )
+        for pdf_path, chunk_id, text, _ in batch:
+            chunk_ids[pdf_path].append(chunk_id)
+            sparse_writer.add(chunk_id, text)
+        total_chunks += len(batch)
+
+        elapsed = time.perf_counter() - start
+        print(f"   {stats['pages']} pages, {total_chunks} chunks | "
+              f"{stats['pages'] / elapsed:.1f} pages/s, {total_chunks / elapsed:.1f} chunks/s")
+
+    sparse_writer.flush()
+    _compact_if_needed(sparse_index)
+
+    for pdf_path, (key, digest, stat) in to_index.items():
+        if pdf_path in failed:
+            continue  # retried on the next run
+        manifest[key] = {
+            "hash": digest,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "profile": profile_name,
+            "chunk_ids": chunk_ids[pdf_path],
+        }
+    save_manifest(manifest_file, manifest)
+    save_index_version(index_version_path(persist_directory, collection_name), manifest)
+
+    if not total_chunks:
+        print("❌ No valid text extracted from PDFs.")
+        return
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Vector DB updated at {persist_directory} ({collection_name}): "
+          f"{stats['pages']} pages, {total_chunks} chunks in {elapsed:.1f}s "
+          f"({stats['pages'] / elapsed:.1f} pages/s, {total_chunks / elapsed:.1f} chunks/s)")
+
+
+def _compact_if_needed(sparse_index):
+    if sparse_index.needs_compaction():
+        start = time.perf_counter()
+        sparse_index.compact()
+        print(f"🧹 Compacted BM25 index ({sparse_index.doc_count} chunks) in {time.perf_counter() - start:.1f}s")
 
-    vectordb = Chroma.from_documents(
-        documents=documents,
-        embedding=embedding,
-        persist_directory=persist_directory
-    )
-    vectordb.persist()
-    print(f"✅ Vector DB created at {persist_directory}")
 
 if __name__ == "__main__":
-    # 👇 Update this path to your actual PDF directory
-    pdf_folder = "medical_pdfs"
-    os.makedirs("rag_db", exist_ok=True)
-    create_vectorstore_from_directory(pdf_folder, persist_directory="./rag_db")
+    parser = argparse.ArgumentParser(description="Build the RAG vector store from a directory of PDFs")
+    parser.add_argument("--pdf-dir", default="medical_pdfs")  # 👈 Update this path to your actual PDF directory
+    parser.add_argument("--persist-directory", default=CHROMA_PERSIST_DIRECTORY)
+    parser.add_argument("--collection", default=CHROMA_COLLECTION_NAME)
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding/upsert batch")
+    parser.add_argument("--workers", type=int, default=None, help="PDF extraction processes (default: CPU count)")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the manifest and re-index every file")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="Chunk size profile: small, standard or large")
+    parser.add_argument("--export-mmap", action=argparse.BooleanOptionalAction, default=VECTOR_STORE == "mmap",
+                        help="Re-export the memory-mapped vector index afterwards (default: when VECTOR_STORE=mmap)")
+    parser.add_argument("--embedding-cache", default=os.getenv("EMBEDDING_DISK_CACHE") or None,
+                        help="SQLite file caching chunk embeddings across runs (default: no cache)")
+    args = parser.parse_args()
+
+    os.makedirs(args.persist_directory, exist_ok=True)
+    create_vectorstore_from_directory(
+        args.pdf_dir,
+        persist_directory=args.persist_directory,
+        collection_name=args.collection,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        rebuild=args.rebuild,
+        profile=args.profile,
+        embedding_cache=args.embedding_cache,
+    )
+
+    if args.export_mmap:
+        start = time.perf_counter()
+        exported = export_collection(
+            get_collection(args.persist_directory, args.collection),
+            mmap_index_directory(args.persist_directory, args.collection),
+            dtype=MMAP_DTYPE,
+            nlist=MMAP_NLIST,
+        )
+        print(f"✅ Exported {exported} chunks to the mmap vector index in {time.perf_counter() - start:.1f}s")
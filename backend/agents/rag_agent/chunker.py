@@ -0,0 +1,236 @@
+# agents/rag_agent/chunker.py
+
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from agents.token_utils import count_tokens
+
+
+@dataclass(frozen=True)
+class ChunkProfile:
+    name: str
+    max_tokens: int      # hard cap per chunk (cl100k tokens, what the generator pays for)
+    overlap_tokens: int  # carried over when a section is split for size
+    min_tokens: int      # smaller trailing chunks are merged into the previous one
+
+
+# all-MiniLM-L6-v2 embeds at most 256 word pieces, so "large" chunks are retrieved by
+# their opening text but give the generator more surrounding context per hit.
+PROFILES = {
+    "small": ChunkProfile("small", max_tokens=160, overlap_tokens=24, min_tokens=30),
+    "standard": ChunkProfile("standard", max_tokens=320, overlap_tokens=40, min_tokens=60),
+    "large": ChunkProfile("large", max_tokens=640, overlap_tokens=80, min_tokens=120),
+}
+DEFAULT_PROFILE = os.getenv("CHUNK_PROFILE", "standard")
+
+
+def get_profile(profile=None) -> ChunkProfile:
+    if isinstance(profile, ChunkProfile):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"❌ Unknown chunk profile: {name} (choose from {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+# === Block detection: headings, table rows, paragraph text ===
+_NUMBERED_HEADING = re.compile(r"^\d+(\.\d+)*\.?\s+[A-Z]")
+_CELL_SEPARATOR = re.compile(r"\s{2,}|\t|\|")
+_NUMBER = re.compile(r"^[<>≤≥±~]?-?\d+([.,]\d+)?%?$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\"'])")
+
+
+def is_heading(line: str) -> bool:
+    """Short numbered, ALL CAPS or Title Case line without a full stop."""
+    line = line.strip()
+    words = line.split()
+    if not words or len(line) > 80 or len(words) > 10 or line[-1] in ".,;":
+        return False
+    if _NUMBERED_HEADING.match(line):
+        return True
+    letters = [w for w in words if w[0].isalpha()]
+    if not letters:
+        return False
+    if line.isupper():
+        return True
+    return len(words) <= 8 and all(w[0].isupper() or len(w) <= 3 for w in letters) and letters[0][0].isupper()
+
+
+def is_table_row(line: str) -> bool:
+    """Pipe- or wide-space-separated cells, or a line made mostly of numeric values."""
+    line = line.strip()
+    if not line:
+        return False
+    cells = [c for c in _CELL_SEPARATOR.split(line) if c.strip()]
+    if len(cells) >= 3:
+        return True
+    tokens = line.split()
+    numbers = sum(1 for t in tokens if _NUMBER.match(t))
+    return len(tokens) >= 3 and numbers >= 2 and numbers / len(tokens) >= 0.5
+
+
+def split_blocks(text: str) -> List[Tuple[str, str]]:
+    """Page text as [(kind, text)] with kind in heading / table / paragraph."""
+    blocks, kind, lines = [], None, []
+
+    def flush():
+        if lines:
+            blocks.append((kind, "\n".join(lines)))
+
+    for line in text.splitlines():
+        if not line.strip():
+            if kind == "paragraph":
+                flush()
+                kind, lines = None, []
+            continue
+
+        line_kind = "heading" if is_heading(line) and not is_table_row(line) else \
+                    "table" if is_table_row(line) else \
+                    "paragraph"
+        # A single row-like line inside a paragraph is text, not a table
+        if line_kind != kind or line_kind == "heading":
+            flush()
+            kind, lines = line_kind, []
+        lines.append(line)
+    flush()
+
+    # Tables need at least two rows; demote lone "rows" back to paragraph text
+    return [("paragraph" if k == "table" and "\n" not in t else k, t) for k, t in blocks]
+
+
+class StructuredChunker:
+    """
+    Token-measured chunking that never crosses a page or heading boundary and keeps
+    tables whole where they fit (oversized tables are split by rows with the header
+    row repeated). Long paragraphs are split at sentence boundaries with overlap.
+    """
+
+    def __init__(self, profile=None):
+        self.profile = get_profile(profile)
+
+    def chunk_page(self, text: str, heading: str = "") -> Tuple[List[Tuple[str, str]], str]:
+        """
+        Chunk one page. Returns ([(section_heading, chunk_text)], last heading) so the
+        caller can continue the section on the next page.
+        """
+        chunks: List[Tuple[str, str]] = []
+        section: List[str] = []
+
+        for kind, block in split_blocks(text):
+            # Headings with no text of their own yet are kept with what follows them
+            headings_only = all(is_heading(b) for b in section)
+            if kind == "heading":
+                if not headings_only:
+                    chunks.extend((heading, c) for c in self._pack(section))
+                    section = []
+                heading = block.strip()
+                section.append(block)
+            elif kind == "table":
+                # Tables get their own chunk(s) so rows are never cut or mixed with prose
+                prefix = "\n".join(section) + "\n" if section and headings_only else ""
+                if not headings_only:
+                    chunks.extend((heading, c) for c in self._pack(section))
+                section = []
+                chunks.extend((heading, prefix + c) for c in self._split_table(block))
+            else:
+                section.append(block)
+
+        # A heading at the very end of a page only names the section continuing on the next one
+        if not all(is_heading(b) for b in section):
+            chunks.extend((heading, c) for c in self._pack(section))
+        return chunks, heading
+
+    def chunk_text(self, text: str) -> List[str]:
+        return [chunk for _, chunk in self.chunk_page(text)[0]]
+
+    # --- packing -----------------------------------------------------------
+    def _pack(self, blocks: List[str]) -> List[str]:
+        """Pack a section's paragraphs into chunks of at most max_tokens, with overlap on size splits."""
+        if not blocks:
+            return []
+        profile = self.profile
+        units = [(s, count_tokens(s)) for block in blocks for s in self._sentences(block)]
+
+        chunks, current, used, carried = [], [], 0, 0
+        for sentence, tokens in units:
+            if used + tokens > profile.max_tokens:
+                if len(current) > carried:
+                    chunks.append(" ".join(s for s, _ in current))
+                    current, used = self._overlap(current)
+                if used + tokens > profile.max_tokens:
+                    current, used = [], 0  # no room for the overlap next to this sentence
+                carried = len(current)
+            current.append((sentence, tokens))
+            used += tokens
+
+        fresh = current[carried:]
+        if fresh:
+            fresh_text = " ".join(s for s, _ in fresh)
+            fresh_tokens = sum(t for _, t in fresh)
+            if chunks and fresh_tokens < profile.min_tokens and count_tokens(chunks[-1]) + fresh_tokens <= profile.max_tokens:
+                chunks[-1] = f"{chunks[-1]} {fresh_text}"  # too small to stand alone
+            else:
+                chunks.append(" ".join(s for s, _ in current))
+        return [c.strip() for c in chunks if c.strip()]
+
+    def _overlap(self, units: List[Tuple[str, int]]) -> Tuple[List[Tuple[str, int]], int]:
+        carried, used = [], 0
+        for sentence, tokens in reversed(units):
+            if used + tokens > self.profile.overlap_tokens:
+                break
+            carried.insert(0, (sentence, tokens))
+            used += tokens
+        return carried, used
+
+    def _sentences(self, block: str) -> List[str]:
+        """Sentences of a paragraph; sentences longer than max_tokens are cut into word windows."""
+        text = " ".join(block.split())
+        sentences = []
+        for sentence in _SENTENCE_END.split(text):
+            if count_tokens(sentence) <= self.profile.max_tokens:
+                sentences.append(sentence)
+            else:
+                sentences.extend(self._word_windows(sentence))
+        return [s for s in sentences if s]
+
+    def _word_windows(self, text: str) -> List[str]:
+        windows, current, used = [], [], 0
+        for word in text.split():
+            tokens = count_tokens(word + " ")
+            if current and used + tokens > self.profile.max_tokens:
+                windows.append(" ".join(current))
+                current, used = [], 0
+            current.append(word)
+            used += tokens
+        if current:
+            windows.append(" ".join(current))
+        return windows
+
+    def _split_table(self, table: str) -> List[str]:
+        if count_tokens(table) <= self.profile.max_tokens:
+            return [table]
+        header, *rows = table.splitlines()
+        header_tokens = count_tokens(header)
+        chunks, current, used = [], [header], header_tokens
+        for row in rows:
+            tokens = count_tokens(row)
+            if len(current) > 1 and used + tokens > self.profile.max_tokens:
+                chunks.append("\n".join(current))
+                current, used = [header], header_tokens
+            current.append(row)
+            used += tokens
+        if len(current) > 1:
+            chunks.append("\n".join(current))
+        return chunks
+
+
+def chunk_document(pages: List[Tuple[int, str]], profile=None, heading: Optional[str] = "") -> List[Tuple[int, str, str]]:
+    """Chunk a document's [(page_number, text)] into [(page_number, section_heading, chunk_text)]."""
+    chunker = StructuredChunker(profile)
+    chunks = []
+    for page_number, text in pages:
+        page_chunks, heading = chunker.chunk_page(text, heading)
+        chunks.extend((page_number, section, chunk) for section, chunk in page_chunks)
+    return chunks
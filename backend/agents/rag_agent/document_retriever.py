@@ -1,65 +1,304 @@
 # agents/document_retriever.py
 
-from typing import List, Dict, Any
+import asyncio
+import os
+import re
+from typing import List, Dict, Any, Optional, Union
 from agents.rag_agent.query_expander import QueryExpander
-from langchain_huggingface import HuggingFaceEmbeddings
-import chromadb
+from agents.rag_agent.sparse_index import SparseIndexLoader, reciprocal_rank_fusion, sparse_index_directory
+from agents.rag_agent.reranker import CrossEncoderReranker
+from agents.rag_agent.vector_store import VECTOR_STORE, create_vector_store
+from agents.async_utils import run_sync
+from agents.llm_loader import get_embedding_service, EMBEDDING_MODEL_NAME
 
 # Step 1: Define a wrapper that matches ChromaDB's required interface
 class ChromaCompatibleEmbeddingFunction:
-    def __init__(self):
-        self.embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
     def __call__(self, input: List[str]) -> List[List[float]]:
-        return self.embedding_model.embed_documents(input)
+        # Query texts only (ingestion passes its own embeddings): cached and micro-batched
+        return get_embedding_service().embed_queries(list(input))
 
     def name(self):
-        return "sentence-transformers/all-MiniLM-L6-v2"
+        return EMBEDDING_MODEL_NAME
 
 # Step 2: Initialize query expander and embedding model
 expander = QueryExpander()
 embedding_function = ChromaCompatibleEmbeddingFunction()
 
-# Step 3: Setup ChromaDB client and collection
-chroma_client = chromadb.PersistentClient(path="agents/rag_agent/rag_db")  # use a persistent path
-collection = chroma_client.get_or_create_collection(
-    name="rag_db",
-    embedding_function=embedding_function
-)
+# Step 3: Setup the vector store: the Chroma collection or its mmap export (opened on first use, not at import)
+CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "agents/rag_agent/rag_db")
+CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "rag_db")
+
+# Hybrid search: BM25 over the same chunks (built by build_rag_vectorstore.py), fused by reciprocal rank
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # depth of each ranked list
+RRF_K = int(os.getenv("RRF_K", "60"))
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))  # over-fetched for the cross-encoder
+TOP_K = 5
+
+# Multi-query: the original, expanded and sub-queries share one batched vector query
+MULTI_QUERY = os.getenv("MULTI_QUERY", "true").lower() == "true"
+MAX_SUB_QUERIES = int(os.getenv("MAX_SUB_QUERIES", "3"))
+
+# Adaptive expansion: results this good with the local expansion skip the LLM expansion
+EXPANSION_CONFIDENT_RERANK = float(os.getenv("EXPANSION_CONFIDENT_RERANK", "0.5"))
+EXPANSION_CONFIDENT_DISTANCE = float(os.getenv("EXPANSION_CONFIDENT_DISTANCE", "0.8"))
+
+# Retrieval this poor (top rerank score below / top vector distance above) is not worth a RAG answer
+RAG_SKIP_RERANK = float(os.getenv("RAG_SKIP_RERANK", "0.02"))
+RAG_SKIP_DISTANCE = float(os.getenv("RAG_SKIP_DISTANCE", "1.4"))
+
+sparse_index = SparseIndexLoader(sparse_index_directory(CHROMA_PERSIST_DIRECTORY, CHROMA_COLLECTION_NAME))
+reranker = CrossEncoderReranker()
+
+vector_store = create_vector_store(VECTOR_STORE, CHROMA_PERSIST_DIRECTORY, CHROMA_COLLECTION_NAME, embedding_function)
+
+def _query_collection(**kwargs):
+    return vector_store.query(**kwargs)
+
+FilterValue = Union[str, List[str], None]
+
+def build_where(source: FilterValue = None, specialty: FilterValue = None, where: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Chroma metadata filter restricting the search to some documents and/or specialties
+    (sub-folders of the ingested PDF directory). Returns None when nothing is filtered.
+    """
+    clauses = [where] if where else []
+    for key, value in (("source", source), ("specialty", specialty)):
+        if isinstance(value, (list, tuple, set)):
+            clauses.append({key: {"$in": list(value)}})
+        elif value:
+            clauses.append({key: value})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _candidate_count() -> int:
+    count = TOP_K
+    if HYBRID_SEARCH:
+        count = max(count, HYBRID_CANDIDATES)
+    if reranker.enabled:
+        count = max(count, RERANK_CANDIDATES)
+    return count
+
+def _sparse_search(query: str, k: int):
+    if not HYBRID_SEARCH:
+        return []
+    index = sparse_index.get()
+    return index.search(query, k) if index else []
+
+_SUB_QUERY_SPLIT = re.compile(r"\?\s+|;\s*|\s+(?:vs\.?|versus|compared (?:to|with))\s+", re.IGNORECASE)
+_AND_SPLIT = re.compile(r",?\s+and\s+(?=(?:what|how|which|when|why|is|are|can|does|do|should)\b)", re.IGNORECASE)
+
+def split_sub_queries(query: str) -> List[str]:
+    """
+    Split a compound question locally (no LLM): separate questions, comparisons
+    ("A vs B") and "..., and how/what ..." clauses. A query with a single part has no
+    sub-queries.
+    """
+    parts = []
+    for part in _SUB_QUERY_SPLIT.split(query):
+        parts.extend(_AND_SPLIT.split(part))
+    parts = [p.strip(" ?.,") for p in parts if p.strip(" ?.,")]
+    return parts[:MAX_SUB_QUERIES] if len(parts) > 1 else []
+
+def build_query_variants(user_query: str, expanded: str) -> List[str]:
+    """Texts to embed for one retrieval: original, expansion and sub-queries, de-duplicated."""
+    if not MULTI_QUERY:
+        return [expanded]
+    variants = [user_query, expanded] + split_sub_queries(user_query)
+    return list(dict.fromkeys(v.strip() for v in variants if v and v.strip()))
+
+def _sparse_query(user_query: str, expanded: str) -> str:
+    # Exact terms the user typed (drug names, codes, doses) plus the expansion's synonyms
+    return user_query if expanded == user_query else f"{user_query} {expanded}"
+
+def is_confident(documents: List[Dict[str, Any]]) -> bool:
+    """Whether retrieval found a clearly relevant chunk (rerank score, or vector distance when not reranked)."""
+    if not documents:
+        return False
+    if documents[0].get("rerank_score") is not None:
+        return documents[0]["rerank_score"] >= EXPANSION_CONFIDENT_RERANK
+    distances = [doc["score"] for doc in documents if doc.get("score") is not None]
+    return bool(distances) and min(distances) <= EXPANSION_CONFIDENT_DISTANCE
+
+def retrieval_confidence(documents: List[Dict[str, Any]]) -> str:
+    """
+    "high" (is_confident), "low" (nothing usable: no documents, or top score past the
+    RAG_SKIP_* thresholds) or "borderline" in between.
+    """
+    if is_confident(documents):
+        return "high"
+    if not documents:
+        return "low"
+    if documents[0].get("rerank_score") is not None:
+        return "low" if documents[0]["rerank_score"] < RAG_SKIP_RERANK else "borderline"
+    distances = [doc["score"] for doc in documents if doc.get("score") is not None]
+    return "low" if distances and min(distances) > RAG_SKIP_DISTANCE else "borderline"
+
+def _search(user_query: str, expanded: str, where: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    results = _query_collection(
+        query_texts=build_query_variants(user_query, expanded),  # one embedding batch, one vector store call
+        n_results=_candidate_count(),
+        where=where
+    )
+    sparse_hits = _sparse_search(_sparse_query(user_query, expanded), _candidate_count())
+    return _select(user_query, _format_results(results, _candidate_count()), sparse_hits, where)
+
+async def _asearch(user_query: str, expanded: str, where: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    results, sparse_hits = await asyncio.gather(
+        run_sync(
+            _query_collection,
+            query_texts=build_query_variants(user_query, expanded),  # one embedding batch, one vector store call
+            n_results=_candidate_count(),
+            where=where
+        ),
+        run_sync(_sparse_search, _sparse_query(user_query, expanded), _candidate_count()),
+    )
+
+    documents = _format_results(results, _candidate_count())
+    if not sparse_hits and not reranker.enabled:
+        return documents[:TOP_K]
+    return await run_sync(_select, user_query, documents, sparse_hits, where)
 
 # Step 4: Define document retrieval logic
-def retrieve_documents(user_query: str) -> List[Dict[str, Any]]:
+def retrieve_documents(
+    user_query: str,
+    source: FilterValue = None,
+    specialty: FilterValue = None,
+    where: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
     """
-    Expands a user query and retrieves relevant documents from ChromaDB.
+    Expands a user query and retrieves relevant documents from the vector store (Chroma or its mmap export).
     
     Args:
         user_query: Raw user input text
+        source: Restrict to one PDF file name (or a list of them)
+        specialty: Restrict to one specialty folder (or a list of them)
+        where: Any additional Chroma metadata filter
     
     Returns:
         A list of documents with relevant content and metadata
     """
     try:
-        # Expand the query
-        expanded = expander.expand_query(user_query)["expanded_query"]
-
-        # Query the vectorstore
-        results = collection.query(
-            query_texts=[expanded],
-            n_results=5
-        )
-
-        # Format the results
-        documents = []
-        for i in range(len(results["ids"][0])):
-            documents.append({
-                "content": results["documents"][0][i],
-                "source": results["metadatas"][0][i].get("source", "Unknown"),
-                "source_path": results["metadatas"][0][i].get("source_path", ""),
-                "score": results["distances"][0][i]
-            })
+        # Expand the query (local terms or a cached LLM expansion; see QueryExpander)
+        expansion = expander.initial_expansion(user_query)
+        where = build_where(source, specialty, where)
+
+        # Query the vectorstore and the BM25 index
+        documents = _search(user_query, expansion["expanded_query"], where)
+
+        # Only queries that retrieve poorly pay for the LLM expansion
+        if expander.wants_llm_retry(expansion) and not is_confident(documents):
+            retry = expander.expand_query(user_query)
+            if retry["expanded_query"] != expansion["expanded_query"]:
+                documents = _search(user_query, retry["expanded_query"], where)
+
+        return documents
+
+    except Exception as e:
+        print(f"[DocumentRetriever Error] {e}")
+        return []
+
+
+async def aretrieve_documents(
+    user_query: str,
+    source: FilterValue = None,
+    specialty: FilterValue = None,
+    where: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Async variant of retrieve_documents. The vector query (embedding + Chroma or mmap search) and
+    the BM25 search run in parallel on the bounded executor, followed by fusion and
+    reranking; an LLM expansion, when needed, is awaited natively.
+    """
+    try:
+        expansion = await expander.ainitial_expansion(user_query)
+        where = build_where(source, specialty, where)
+
+        documents = await _asearch(user_query, expansion["expanded_query"], where)
+
+        if expander.wants_llm_retry(expansion) and not is_confident(documents):
+            retry = await expander.aexpand_query(user_query)
+            if retry["expanded_query"] != expansion["expanded_query"]:
+                documents = await _asearch(user_query, retry["expanded_query"], where)
 
         return documents
 
     except Exception as e:
         print(f"[DocumentRetriever Error] {e}")
         return []
+
+
+def _select(user_query: str, dense_docs: List[Dict[str, Any]], sparse_hits, where: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fuse the candidate lists, then let the cross-encoder pick the final top-k."""
+    candidates = _fuse(dense_docs, sparse_hits, where, limit=RERANK_CANDIDATES if reranker.enabled else TOP_K)
+    return reranker.rerank(user_query, candidates, TOP_K)
+
+
+def _fuse(dense_docs: List[Dict[str, Any]], sparse_hits, where: Optional[Dict[str, Any]], limit: int = TOP_K) -> List[Dict[str, Any]]:
+    """
+    Reciprocal-rank fusion of the vector and BM25 rankings. BM25-only hits are fetched
+    from the vector store (with the same metadata filter, which drops out-of-scope chunks).
+    """
+    if not sparse_hits:
+        return dense_docs[:limit]
+
+    by_id = {doc["id"]: doc for doc in dense_docs}
+    bm25_scores = dict(sparse_hits)
+    fused = reciprocal_rank_fusion([[doc["id"] for doc in dense_docs], [chunk_id for chunk_id, _ in sparse_hits]], k=RRF_K)
+
+    missing = [chunk_id for chunk_id, _ in fused[:limit * 2] if chunk_id not in by_id]
+    if missing:
+        fetched = vector_store.get(ids=missing, where=where, include=["documents", "metadatas"])
+        metadatas = fetched.get("metadatas") or [None] * len(fetched["ids"])
+        for chunk_id, content, metadata in zip(fetched["ids"], fetched["documents"], metadatas):
+            by_id[chunk_id] = _to_document(chunk_id, content, metadata, None)
+
+    documents = []
+    for chunk_id, rrf_score in fused:
+        doc = by_id.get(chunk_id)
+        if doc is None:
+            continue  # filtered out by `where`, or not fetched
+        documents.append({**doc, "combined_score": rrf_score, "bm25_score": bm25_scores.get(chunk_id)})
+        if len(documents) == limit:
+            break
+    return documents
+
+
+def _to_document(chunk_id: str, content: str, metadata: Optional[Dict[str, Any]], distance: Optional[float]) -> Dict[str, Any]:
+    metadata = metadata or {}
+    return {
+        "id": chunk_id,
+        "content": content,
+        "source": metadata.get("source", "Unknown"),
+        "source_path": metadata.get("source_path", ""),
+        "page": metadata.get("page"),
+        "section": metadata.get("section", ""),
+        "specialty": metadata.get("specialty", ""),
+        "score": distance  # vector distance (lower is closer); None for BM25-only hits
+    }
+
+
+def _format_results(results, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Merge the per-query result lists of a (multi-query) Chroma response: each chunk
+    once, at its best distance, closest first.
+    """
+    best: Dict[str, Dict[str, Any]] = {}
+    for q in range(len(results["ids"])):
+        # Chroma returns None for metadatas (or for single entries) when chunks were stored without any
+        metadatas = (results.get("metadatas") or [None] * len(results["ids"]))[q] or []
+        for i, chunk_id in enumerate(results["ids"][q]):
+            distance = results["distances"][q][i]
+            if chunk_id in best and best[chunk_id]["score"] <= distance:
+                continue
+            best[chunk_id] = _to_document(
+                chunk_id,
+                results["documents"][q][i],
+                metadatas[i] if i < len(metadatas) else None,
+                distance
+            )
+
+    documents = sorted(best.values(), key=lambda doc: doc["score"])
+    return documents[:limit] if limit else documents
@@ -0,0 +1,112 @@
+# agents/rag_agent/medical_terms.py
+#
+# Abbreviations and lay terms used for local query expansion (see query_expander.py).
+# All-caps abbreviations only match when written in capitals, so "MS" expands but "ms" does not.
+
+ABBREVIATIONS = {
+    "ACE": "angiotensin-converting enzyme",
+    "ACS": "acute coronary syndrome",
+    "ADHD": "attention deficit hyperactivity disorder",
+    "AF": "atrial fibrillation",
+    "AFib": "atrial fibrillation",
+    "AKI": "acute kidney injury",
+    "ALS": "amyotrophic lateral sclerosis",
+    "ARB": "angiotensin receptor blocker",
+    "ARDS": "acute respiratory distress syndrome",
+    "BMI": "body mass index",
+    "BP": "blood pressure",
+    "BPH": "benign prostatic hyperplasia",
+    "CABG": "coronary artery bypass graft",
+    "CAD": "coronary artery disease",
+    "CBC": "complete blood count",
+    "CHF": "congestive heart failure",
+    "CKD": "chronic kidney disease",
+    "COPD": "chronic obstructive pulmonary disease",
+    "CPR": "cardiopulmonary resuscitation",
+    "CRP": "C-reactive protein",
+    "CT": "computed tomography",
+    "CVA": "cerebrovascular accident stroke",
+    "CVD": "cardiovascular disease",
+    "DKA": "diabetic ketoacidosis",
+    "DM": "diabetes mellitus",
+    "DVT": "deep vein thrombosis",
+    "ECG": "electrocardiogram",
+    "EKG": "electrocardiogram",
+    "eGFR": "estimated glomerular filtration rate",
+    "ESRD": "end-stage renal disease",
+    "GERD": "gastroesophageal reflux disease",
+    "GI": "gastrointestinal",
+    "HbA1c": "glycated hemoglobin",
+    "HDL": "high-density lipoprotein cholesterol",
+    "HF": "heart failure",
+    "HIV": "human immunodeficiency virus",
+    "HPV": "human papillomavirus",
+    "HRT": "hormone replacement therapy",
+    "HTN": "hypertension",
+    "IBD": "inflammatory bowel disease",
+    "IBS": "irritable bowel syndrome",
+    "ICU": "intensive care unit",
+    "INR": "international normalized ratio",
+    "IV": "intravenous",
+    "LDL": "low-density lipoprotein cholesterol",
+    "MI": "myocardial infarction",
+    "MRI": "magnetic resonance imaging",
+    "MRSA": "methicillin-resistant Staphylococcus aureus",
+    "MS": "multiple sclerosis",
+    "NSAID": "nonsteroidal anti-inflammatory drug",
+    "NSAIDs": "nonsteroidal anti-inflammatory drugs",
+    "OA": "osteoarthritis",
+    "OCD": "obsessive-compulsive disorder",
+    "PCI": "percutaneous coronary intervention",
+    "PCOS": "polycystic ovary syndrome",
+    "PE": "pulmonary embolism",
+    "PPI": "proton pump inhibitor",
+    "PTSD": "post-traumatic stress disorder",
+    "RA": "rheumatoid arthritis",
+    "SSRI": "selective serotonin reuptake inhibitor",
+    "SSRIs": "selective serotonin reuptake inhibitors",
+    "STEMI": "ST-elevation myocardial infarction",
+    "T1DM": "type 1 diabetes mellitus",
+    "T2DM": "type 2 diabetes mellitus",
+    "TB": "tuberculosis",
+    "TIA": "transient ischemic attack",
+    "TSH": "thyroid-stimulating hormone",
+    "URTI": "upper respiratory tract infection",
+    "UTI": "urinary tract infection",
+}
+
+# Lay phrase → clinical term (matched case-insensitively on word boundaries)
+SYNONYMS = {
+    "heart attack": "myocardial infarction",
+    "high blood pressure": "hypertension",
+    "low blood pressure": "hypotension",
+    "high cholesterol": "hyperlipidemia",
+    "high blood sugar": "hyperglycemia",
+    "low blood sugar": "hypoglycemia",
+    "sugar diabetes": "diabetes mellitus",
+    "stroke": "cerebrovascular accident",
+    "mini stroke": "transient ischemic attack",
+    "blood clot": "thrombosis",
+    "blood thinner": "anticoagulant",
+    "blood thinners": "anticoagulants",
+    "kidney failure": "renal failure",
+    "kidney stones": "nephrolithiasis",
+    "heartburn": "gastroesophageal reflux",
+    "acid reflux": "gastroesophageal reflux",
+    "irregular heartbeat": "arrhythmia",
+    "shortness of breath": "dyspnea",
+    "chest pain": "angina",
+    "painkiller": "analgesic",
+    "painkillers": "analgesics",
+    "underactive thyroid": "hypothyroidism",
+    "overactive thyroid": "hyperthyroidism",
+    "water pill": "diuretic",
+    "water pills": "diuretics",
+    "flu": "influenza",
+    "bedsore": "pressure ulcer",
+    "bedsores": "pressure ulcers",
+    "pink eye": "conjunctivitis",
+    "sore throat": "pharyngitis",
+    "runny nose": "rhinorrhea",
+    "brittle bones": "osteoporosis",
+}
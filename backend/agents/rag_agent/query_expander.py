@@ -1,37 +1,203 @@
 import logging
-from typing import List, Dict, Any
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
 from agents.llm_loader import get_llm
+from agents.rag_agent.medical_terms import ABBREVIATIONS, SYNONYMS
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split()).strip(" ?.!")
+
+
+class ExpansionCache:
+    """
+    LRU cache with a TTL for LLM expansions, keyed on the normalized query.
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: float = 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expanded_query, stored_at)
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[str]:
+        key = normalize_query(query)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expanded, stored_at = item
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return expanded
+
+    def set(self, query: str, expanded: str):
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = (expanded, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class QueryExpander:
     """
     Expands user queries with medical terminology to improve retrieval.
+
+    Two tiers: a local abbreviation/synonym expansion (microseconds, always applied)
+    and an LLM expansion (cached). QUERY_EXPANSION selects how the retriever uses them:
+      local    - never call the LLM
+      adaptive - call the LLM only when the locally expanded query retrieves poorly
+      llm      - always use the LLM expansion (the original behaviour, now cached)
     """
-    
-    def __init__(self):
+
+    def __init__(self, mode: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
-        self.model = get_llm()
+        self.mode = (mode or os.getenv("QUERY_EXPANSION", "adaptive")).lower()
+        if self.mode not in ("local", "adaptive", "llm"):
+            raise ValueError(f"❌ Unknown QUERY_EXPANSION mode: {self.mode}")
+        self.cache = ExpansionCache(
+            max_entries=int(os.getenv("QUERY_EXPANSION_CACHE_SIZE", "5000")),
+            ttl_seconds=float(os.getenv("QUERY_EXPANSION_CACHE_TTL", "86400")),
+        )
+        self._model = None
+        self.stats = {"local": 0, "llm": 0, "cache_hits": 0, "llm_errors": 0}
+
+        # Case-sensitive for all-caps abbreviations ("MS" but not "ms"), case-insensitive otherwise
+        self._abbreviations = [
+            (re.compile(rf"\b{re.escape(abbr)}\b", 0 if abbr.isupper() else re.IGNORECASE), expansion)
+            for abbr, expansion in ABBREVIATIONS.items()
+        ]
+        self._synonyms = [
+            (re.compile(rf"\b{re.escape(phrase)}\b", re.IGNORECASE), term)
+            for phrase, term in SYNONYMS.items()
+        ]
+
+    @property
+    def model(self):
+        # Loaded on first LLM expansion; local-only deployments never create the client here
+        if self._model is None:
+            self._model = get_llm()
+        return self._model
+
+    def expand_local(self, original_query: str) -> Dict[str, Any]:
+        """
+        Append the full forms of abbreviations and the clinical terms for lay phrases
+        found in the query (terms already present are not repeated).
+        """
+        self.stats["local"] += 1
+        return {
+            "original_query": original_query,
+            "expanded_query": self._with_local_terms(original_query, original_query),
+            "method": "local"
+        }
 
     def expand_query(self, original_query: str) -> Dict[str, Any]:
         """
         Expand the original query with relevant medical terms.
-        
+
         Args:
             original_query: The user's original query
-            
+
         Returns:
             Dictionary with original and expanded queries
         """
+        cached = self.get_cached(original_query)
+        if cached:
+            return cached
+
         self.logger.info(f"Expanding query: {original_query}")
-        
-        # Generate expansions - implement one of the strategies below
-        expanded_query = self._generate_expansions(original_query)
-        
-        return {
-            "original_query": original_query,
-            "expanded_query": expanded_query.content
-        }
-    
+        try:
+            # Generate expansions - implement one of the strategies below
+            expanded_query = self._generate_expansions(original_query)
+        except Exception as e:
+            self.logger.error(f"LLM query expansion failed: {e}")
+            self.stats["llm_errors"] += 1
+            return self.expand_local(original_query)
+
+        return self._store(original_query, expanded_query.content)
+
+    async def aexpand_query(self, original_query: str) -> Dict[str, Any]:
+        """
+        Async variant of expand_query.
+        """
+        cached = self.get_cached(original_query)
+        if cached:
+            return cached
+
+        self.logger.info(f"Expanding query: {original_query}")
+        try:
+            expanded_query = await self.model.ainvoke(self._build_prompt(original_query))
+        except Exception as e:
+            self.logger.error(f"LLM query expansion failed: {e}")
+            self.stats["llm_errors"] += 1
+            return self.expand_local(original_query)
+
+        return self._store(original_query, expanded_query.content)
+
+    def initial_expansion(self, original_query: str) -> Dict[str, Any]:
+        """
+        Expansion to retrieve with first, without waiting on the LLM unless mode is "llm":
+        a cached LLM expansion if there is one, otherwise the local expansion.
+        """
+        if self.mode == "llm":
+            return self.expand_query(original_query)
+        if self.mode == "adaptive":
+            cached = self.get_cached(original_query)
+            if cached:
+                return cached
+        return self.expand_local(original_query)
+
+    async def ainitial_expansion(self, original_query: str) -> Dict[str, Any]:
+        if self.mode == "llm":
+            return await self.aexpand_query(original_query)
+        return self.initial_expansion(original_query)
+
+    def wants_llm_retry(self, expansion: Dict[str, Any]) -> bool:
+        """Adaptive mode: a local expansion that retrieved poorly is retried with the LLM expansion."""
+        return self.mode == "adaptive" and expansion["method"] == "local"
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "mode": self.mode, "cached_expansions": len(self.cache)}
+
+    def get_cached(self, original_query: str) -> Optional[Dict[str, Any]]:
+        """The cached LLM expansion of the query, if any (no LLM call)."""
+        expanded = self.cache.get(original_query)
+        if expanded is None:
+            return None
+        self.stats["cache_hits"] += 1
+        return {"original_query": original_query, "expanded_query": expanded, "method": "cache"}
+
+    def _store(self, original_query: str, llm_expansion: str) -> Dict[str, Any]:
+        self.stats["llm"] += 1
+        expanded = self._with_local_terms(original_query, llm_expansion.strip() or original_query)
+        self.cache.set(original_query, expanded)
+        return {"original_query": original_query, "expanded_query": expanded, "method": "llm"}
+
+    def _with_local_terms(self, query: str, expanded: str) -> str:
+        terms: List[str] = []
+        lowered = expanded.lower()
+        for pattern, term in self._abbreviations + self._synonyms:
+            if pattern.search(query) and term.lower() not in lowered and term not in terms:
+                terms.append(term)
+        return f"{expanded} {' '.join(terms)}" if terms else expanded
+
     def _generate_expansions(self, query: str) -> str:
         """Use LLM to expand query with medical terminology."""
+        expansion = self.model.invoke(self._build_prompt(query))
+        
+        return expansion
+
+    def _build_prompt(self, query: str) -> str:
         prompt = f"""
         As a medical expert, expand the following query with relevant medical terminology, 
         synonyms, and related concepts that would help in retrieving relevant medical information:
@@ -43,6 +209,4 @@ class QueryExpander:
         If the user query asks about answering in tabular format, include that in the expanded query and do not answer in tabular format yourself.
         Provide only the expanded query without explanations.
         """
-        expansion = self.model.invoke(prompt)
-        
-        return expansion
\ No newline at end of file
+        return prompt
\ No newline at end of file
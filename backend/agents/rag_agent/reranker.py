@@ -0,0 +1,119 @@
+# agents/rag_agent/reranker.py
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from agents.llm_loader import get_reranker
+
+
+class CrossEncoderReranker:
+    """
+    Reorders over-fetched retrieval candidates with a small CPU cross-encoder.
+
+    Pair scores are cached (LRU) so repeated questions only score new chunks. Reranking
+    is skipped, keeping the incoming (fused/vector) order, when too many reranks are
+    already running, when the expected scoring time exceeds the latency budget, or when
+    the budget runs out between batches.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = None,
+        batch_size: int = None,
+        timeout_ms: float = None,
+        max_concurrent: int = None,
+        cache_size: int = None,
+    ):
+        self.enabled = enabled if enabled is not None else os.getenv("RERANK", "true").lower() == "true"
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", "16"))
+        self.timeout_ms = timeout_ms if timeout_ms is not None else float(os.getenv("RERANK_TIMEOUT_MS", "300"))
+        self.cache_size = cache_size or int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+        self._slots = threading.BoundedSemaphore(max_concurrent or int(os.getenv("RERANK_MAX_CONCURRENT", "2")))
+
+        self._cache: "OrderedDict[tuple, float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._ms_per_pair = None  # moving average, used to predict whether a rerank fits the budget
+        self.stats = {"reranked": 0, "cache_hits": 0, "scored_pairs": 0, "skipped_busy": 0, "skipped_budget": 0, "timeouts": 0}
+
+    def warm_up(self):
+        if self.enabled:
+            get_reranker().predict([("warm up", "warm up")])
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """Top-k candidates by cross-encoder score (adds rerank_score in 0..1), or candidates[:top_k]."""
+        if not self.enabled or len(candidates) <= 1:
+            return candidates[:top_k]
+        if not self._slots.acquire(blocking=False):
+            self.stats["skipped_busy"] += 1
+            return candidates[:top_k]
+        try:
+            scores = self._score(query, candidates)
+        finally:
+            self._slots.release()
+        if scores is None:
+            return candidates[:top_k]
+
+        self.stats["reranked"] += 1
+        ranked = sorted(zip(candidates, scores), key=lambda item: item[1], reverse=True)
+        return [{**doc, "rerank_score": score} for doc, score in ranked[:top_k]]
+
+    def _score(self, query: str, candidates: List[Dict[str, Any]]):
+        query_key = " ".join(query.lower().split())
+        keys = [(query_key, doc.get("id") or hash(doc["content"])) for doc in candidates]
+
+        scores = [None] * len(candidates)
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+        pending = [i for i, score in enumerate(scores) if score is None]
+        self.stats["cache_hits"] += len(candidates) - len(pending)
+        if not pending:
+            return scores
+
+        if self._ms_per_pair is not None and self._ms_per_pair * len(pending) > self.timeout_ms:
+            self.stats["skipped_budget"] += 1
+            self._ms_per_pair *= 0.9  # decay so reranking is retried once the CPU frees up
+            return None
+
+        model = get_reranker()
+        start = time.perf_counter()
+        scored, timed_out = [], False
+        for offset in range(0, len(pending), self.batch_size):
+            if (time.perf_counter() - start) * 1000 > self.timeout_ms:
+                timed_out = True
+                break
+            batch = pending[offset:offset + self.batch_size]
+            logits = model.predict([(query, candidates[i]["content"]) for i in batch], batch_size=self.batch_size)
+            for i, logit in zip(batch, logits):
+                scores[i] = 1.0 / (1.0 + math.exp(-float(logit)))
+            scored.extend(batch)
+
+        # Whatever was scored feeds the latency estimate and the cache, even on timeout
+        if scored:
+            per_pair = (time.perf_counter() - start) * 1000 / len(scored)
+            self._ms_per_pair = per_pair if self._ms_per_pair is None else 0.8 * self._ms_per_pair + 0.2 * per_pair
+        self.stats["scored_pairs"] += len(scored)
+        with self._cache_lock:
+            for i in scored:
+                self._cache[keys[i]] = scores[i]
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        if timed_out:
+            self.stats["timeouts"] += 1
+            return None
+        return scores
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "cached_pairs": len(self._cache),
+            "ms_per_pair": round(self._ms_per_pair, 2) if self._ms_per_pair is not None else None,
+        }
@@ -6,6 +6,8 @@ class ResponseGenerator:
     """
     Generates responses based on retrieved context and user query.
     """
+    ERROR_MESSAGE = "I apologize, but I encountered an error while generating a response. Please try rephrasing your question."
+
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.response_generator_model = get_llm()  # Load LLM from llm_loader
@@ -78,38 +80,96 @@ Medical Assistant Response:"""
         chat_history: Optional[List[Dict[str, str]]] = None
     ) -> Dict[str, Any]:
         try:
-            doc_texts = [doc["content"] for doc in retrieved_docs]
-            context = "\n\n===DOCUMENT SECTION===\n\n".join(doc_texts)
-            prompt = self._build_prompt(query, context, chat_history)
+            prompt = self._build_prompt(query, self._build_context(retrieved_docs), chat_history)
             response = self.response_generator_model.invoke(prompt)
+            return self._finalize_response(response.content, retrieved_docs, picture_paths)
 
-            sources = self._extract_sources(retrieved_docs) if self.include_sources else []
-            confidence = self._calculate_confidence(retrieved_docs)
+        except Exception as e:
+            self.logger.error(f"Error generating response: {e}")
+            return self._error_response()
 
-            response_text = response.content
-            if self.include_sources:
-                response_text += "\n\n##### Source documents:"
-                for src in sources:
-                    response_text += f"\n- [{src['title']}]({src['path']})"
+    async def agenerate_response(
+        self,
+        query: str,
+        retrieved_docs: List[Dict[str, Any]],
+        picture_paths: Optional[List[str]] = None,
+        chat_history: Optional[List[Dict[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """Async variant of generate_response using the LLM's native ainvoke."""
+        try:
+            prompt = self._build_prompt(query, self._build_context(retrieved_docs), chat_history)
+            response = await self.response_generator_model.ainvoke(prompt)
+            return self._finalize_response(response.content, retrieved_docs, picture_paths)
 
-            if picture_paths:
-                response_text += "\n\n##### Reference images:"
-                for path in picture_paths:
-                    response_text += f"\n- [{path.split('/')[-1]}]({path})"
+        except Exception as e:
+            self.logger.error(f"Error generating response: {e}")
+            return self._error_response()
 
-            return {
-                "response": response_text,
-                "sources": sources,
-                "confidence": confidence
-            }
+    async def astream_response(
+        self,
+        query: str,
+        retrieved_docs: List[Dict[str, Any]],
+        picture_paths: Optional[List[str]] = None,
+        chat_history: Optional[List[Dict[str, str]]] = None
+    ):
+        """
+        Streams the generated answer token by token; the source/image footer is
+        yielded as the final chunk once generation is complete.
+        """
+        try:
+            prompt = self._build_prompt(query, self._build_context(retrieved_docs), chat_history)
+            async for chunk in self.response_generator_model.astream(prompt):
+                if chunk.content:
+                    yield chunk.content
 
         except Exception as e:
             self.logger.error(f"Error generating response: {e}")
-            return {
-                "response": "I apologize, but I encountered an error while generating a response. Please try rephrasing your question.",
-                "sources": [],
-                "confidence": 0.0
-            }
+            yield self._error_response()["response"]
+            return
+
+        footer = self._finalize_response("", retrieved_docs, picture_paths)["response"]
+        if footer:
+            yield footer
+
+    def get_sources(self, retrieved_docs: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Citations for the retrieved documents (empty when sources are disabled)."""
+        return self._extract_sources(retrieved_docs) if self.include_sources else []
+
+    def _build_context(self, retrieved_docs: List[Dict[str, Any]]) -> str:
+        doc_texts = [doc["content"] for doc in retrieved_docs]
+        return "\n\n===DOCUMENT SECTION===\n\n".join(doc_texts)
+
+    def _finalize_response(
+        self,
+        response_text: str,
+        retrieved_docs: List[Dict[str, Any]],
+        picture_paths: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        sources = self.get_sources(retrieved_docs)
+        confidence = self._calculate_confidence(retrieved_docs)
+
+        if self.include_sources:
+            response_text += "\n\n##### Source documents:"
+            for src in sources:
+                response_text += f"\n- [{src['title']}]({src['path']})"
+
+        if picture_paths:
+            response_text += "\n\n##### Reference images:"
+            for path in picture_paths:
+                response_text += f"\n- [{path.split('/')[-1]}]({path})"
+
+        return {
+            "response": response_text,
+            "sources": sources,
+            "confidence": confidence
+        }
+
+    def _error_response(self) -> Dict[str, Any]:
+        return {
+            "response": self.ERROR_MESSAGE,
+            "sources": [],
+            "confidence": 0.0
+        }
 
     def _extract_sources(self, documents: List[Dict[str, Any]]) -> List[Dict[str, str]]:
         sources = []
@@ -128,7 +188,7 @@ Medical Assistant Response:"""
             sources.append({
                 "title": title,
                 "path": path,
-                "score": doc.get("combined_score", doc.get("rerank_score", doc.get("score", 0.0)))
+                "score": doc.get("rerank_score", doc.get("combined_score", doc.get("score", 0.0)))
             })
             seen.add(source_id)
 
@@ -139,7 +199,7 @@ Medical Assistant Response:"""
         if not documents:
             return 0.0
 
-        keys = ["combined_score", "rerank_score", "score"]
+        keys = ["rerank_score", "combined_score", "score"]
         for key in keys:
             if key in documents[0]:
                 scores = [doc.get(key, 0) for doc in documents[:3]]
@@ -0,0 +1,309 @@
+# agents/rag_agent/sparse_index.py
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Keeps codes and doses whole: "e11.9", "co-amoxiclav", "2.5mg", "hba1c"
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its may of on or "
+    "should that the their there these this to was what when which who why will with you your".split()
+)
+
+SEGMENTS_FILE = "segments.json"
+
+
+def sparse_index_directory(persist_directory: str, collection_name: str) -> str:
+    """Where the BM25 index of a Chroma collection lives (next to the collection)."""
+    return os.path.join(persist_directory, f"{collection_name}_bm25")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        # Compounds also match their parts ("co-amoxiclav" → "amoxiclav")
+        if "-" in token or "/" in token:
+            tokens.extend(part for part in re.split(r"[\-/]", token) if part and part not in STOPWORDS)
+    return tokens
+
+
+class _Segment:
+    """One immutable, memory-mapped slice of the index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "terms.txt"), encoding="utf-8") as f:
+            self.terms = {term: i for i, term in enumerate(f.read().split("\n")) if term}
+        with open(os.path.join(path, "chunk_ids.json"), encoding="utf-8") as f:
+            self.chunk_ids = json.load(f)
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.doc_index = np.load(os.path.join(path, "doc_index.npy"), mmap_mode="r")
+        self.term_freq = np.load(os.path.join(path, "term_freq.npy"), mmap_mode="r")
+        self.doc_lengths = np.load(os.path.join(path, "doc_lengths.npy"), mmap_mode="r")
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = self.terms.get(term)
+        if i is None:
+            return None, None
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.doc_index[start:end], self.term_freq[start:end]
+
+
+def _write_segment(path: str, chunk_ids: List[str], doc_lengths: array, postings: Dict[str, Tuple[array, array]]):
+    os.makedirs(path, exist_ok=True)
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[t][0]) for t in terms])
+
+    doc_index = np.empty(int(offsets[-1]), dtype=np.int32)
+    term_freq = np.empty(int(offsets[-1]), dtype=np.uint16)
+    for i, term in enumerate(terms):
+        docs, freqs = postings[term]
+        doc_index[offsets[i]:offsets[i + 1]] = docs
+        term_freq[offsets[i]:offsets[i + 1]] = np.minimum(np.frombuffer(freqs, dtype=np.int32), 65535)
+
+    with open(os.path.join(path, "terms.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(terms))
+    with open(os.path.join(path, "chunk_ids.json"), "w", encoding="utf-8") as f:
+        json.dump(chunk_ids, f)
+    np.save(os.path.join(path, "offsets.npy"), offsets)
+    np.save(os.path.join(path, "doc_index.npy"), doc_index)
+    np.save(os.path.join(path, "term_freq.npy"), term_freq)
+    np.save(os.path.join(path, "doc_lengths.npy"), np.frombuffer(doc_lengths, dtype=np.int32))
+
+
+class SparseIndexWriter:
+    """
+    Accumulates (chunk_id, text) pairs and flushes them as new segments of the index,
+    every `segment_size` chunks, so memory stays bounded for full rebuilds.
+    """
+
+    def __init__(self, index: "BM25Index", segment_size: int = 50000):
+        self.index = index
+        self.segment_size = segment_size
+        self._reset()
+
+    def _reset(self):
+        self.chunk_ids: List[str] = []
+        self.doc_lengths = array("i")
+        self.postings: Dict[str, Tuple[array, array]] = {}
+
+    def add(self, chunk_id: str, text: str):
+        tokens = tokenize(text)
+        doc = len(self.chunk_ids)
+        self.chunk_ids.append(chunk_id)
+        self.doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            docs, freqs = self.postings.setdefault(term, (array("i"), array("i")))
+            docs.append(doc)
+            freqs.append(tf)
+        if len(self.chunk_ids) >= self.segment_size:
+            self.flush()
+
+    def flush(self):
+        if self.chunk_ids:
+            self.index.add_segment(self.chunk_ids, self.doc_lengths, self.postings)
+        self._reset()
+
+
+class BM25Index:
+    """
+    On-disk BM25 index kept in sync with the Chroma collection by the ingestion script.
+
+    Each ingestion run appends an immutable segment (memory-mapped numpy postings);
+    chunks removed from the collection are recorded as deleted in the segments holding
+    them and dropped when the segments are compacted. Collection statistics (N, avgdl,
+    df) are summed across segments.
+    """
+
+    def __init__(self, directory: str, k1: float = 1.2, b: float = 0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self._load()
+
+    # --- loading -------------------------------------------------------------
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, SEGMENTS_FILE)
+
+    def _load(self):
+        manifest = {"segments": [], "deleted": {}}
+        if os.path.exists(self._manifest_path()):
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                manifest = json.load(f)
+        self.segment_names: List[str] = manifest["segments"]
+        # segment name → chunk IDs deleted from that segment
+        self.deleted: Dict[str, set] = {name: set(ids) for name, ids in manifest["deleted"].items()}
+        self.segments = [_Segment(os.path.join(self.directory, name)) for name in self.segment_names]
+
+        total_docs = sum(len(s.chunk_ids) for s in self.segments)
+        total_length = sum(int(np.sum(s.doc_lengths, dtype=np.int64)) for s in self.segments)
+        self.deleted_count = sum(len(ids) for ids in self.deleted.values())
+        self.doc_count = total_docs - self.deleted_count
+        self.avg_doc_length = total_length / total_docs if total_docs else 0.0
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, SEGMENTS_FILE))
+
+    def _save_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._manifest_path()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segments": self.segment_names, "deleted": {n: sorted(ids) for n, ids in self.deleted.items() if ids}}, f)
+        os.replace(tmp_path, self._manifest_path())
+
+    # --- writing (ingestion only) ---------------------------------------------
+    def writer(self, segment_size: int = 50000) -> SparseIndexWriter:
+        return SparseIndexWriter(self, segment_size)
+
+    def add_segment(self, chunk_ids, doc_lengths, postings):
+        name = f"seg-{uuid.uuid4().hex[:12]}"
+        _write_segment(os.path.join(self.directory, name), chunk_ids, doc_lengths, postings)
+        self.segment_names.append(name)
+        self._save_manifest()
+        self._load()
+
+    def delete(self, chunk_ids: Iterable[str]):
+        """Mark chunks deleted in every existing segment that holds them."""
+        chunk_ids = set(chunk_ids)
+        if not chunk_ids:
+            return
+        for name, segment in zip(self.segment_names, self.segments):
+            present = chunk_ids.intersection(segment.chunk_ids)
+            if present:
+                self.deleted.setdefault(name, set()).update(present)
+        self._save_manifest()
+        self._load()
+
+    def clear(self):
+        for name in self.segment_names:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        self.segment_names, self.deleted = [], {}
+        self._save_manifest()
+        self._load()
+
+    def needs_compaction(self, max_segments: int = 8, max_deleted_ratio: float = 0.2) -> bool:
+        total = sum(len(s.chunk_ids) for s in self.segments)
+        return len(self.segments) > max_segments or bool(total and self.deleted_count / total > max_deleted_ratio)
+
+    def compact(self):
+        """Merge all segments into one, dropping deleted chunks."""
+        chunk_ids, doc_lengths, postings = [], array("i"), {}
+        for name, segment in zip(self.segment_names, self.segments):
+            deleted = self.deleted.get(name, set())
+            remap = np.full(len(segment.chunk_ids), -1, dtype=np.int32)
+            for d, chunk_id in enumerate(segment.chunk_ids):
+                if chunk_id not in deleted:
+                    remap[d] = len(chunk_ids)
+                    chunk_ids.append(chunk_id)
+                    doc_lengths.append(int(segment.doc_lengths[d]))
+
+            for term, i in segment.terms.items():
+                start, end = int(segment.offsets[i]), int(segment.offsets[i + 1])
+                new_docs = remap[segment.doc_index[start:end]]
+                keep = new_docs >= 0
+                if not keep.any():
+                    continue
+                docs, freqs = postings.setdefault(term, (array("i"), array("i")))
+                docs.extend(new_docs[keep].tolist())
+                freqs.extend(segment.term_freq[start:end][keep].astype(np.int32).tolist())
+
+        old_names = self.segment_names
+        name = f"seg-{uuid.uuid4().hex[:12]}"
+        _write_segment(os.path.join(self.directory, name), chunk_ids, doc_lengths, postings)
+        self.segment_names, self.deleted = [name], {}
+        self._save_manifest()
+        self._load()
+        for old in old_names:
+            shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+
+    # --- search ----------------------------------------------------------------
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (chunk_id, bm25_score), best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_count:
+            return []
+
+        postings = {t: [seg.postings(t) for seg in self.segments] for t in terms}
+        results: Dict[str, float] = {}
+        for s, (name, segment) in enumerate(zip(self.segment_names, self.segments)):
+            deleted = self.deleted.get(name, ())
+            doc_parts, score_parts = [], []
+            for term in terms:
+                docs, freqs = postings[term][s]
+                if docs is None:
+                    continue
+                df = sum(len(p[0]) for p in postings[term] if p[0] is not None)
+                idf = np.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+                tf = freqs.astype(np.float32)
+                norm = self.k1 * (1 - self.b + self.b * segment.doc_lengths[docs] / self.avg_doc_length)
+                doc_parts.append(docs)
+                score_parts.append(idf * tf * (self.k1 + 1) / (tf + norm))
+            if not doc_parts:
+                continue
+
+            docs = np.concatenate(doc_parts)
+            unique_docs, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+            top = np.argsort(-scores)[: k + len(deleted)]
+            for d, score in zip(unique_docs[top], scores[top]):
+                chunk_id = segment.chunk_ids[d]
+                if chunk_id not in deleted:
+                    results[chunk_id] = float(score)
+
+        return sorted(results.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: score(id) = Σ 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class SparseIndexLoader:
+    """
+    Lazily opened index for the server; reopened when ingestion rewrites the segment list
+    (checked at most every `check_interval` seconds).
+    """
+
+    def __init__(self, directory: str, check_interval: float = 30.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._index: Optional[BM25Index] = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[BM25Index]:
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.check_interval:
+            return self._index
+        with self._lock:
+            self._checked_at = now
+            path = os.path.join(self.directory, SEGMENTS_FILE)
+            if not os.path.exists(path):
+                self._index = None
+                return None
+            mtime = os.path.getmtime(path)
+            if self._index is None or mtime != self._mtime:
+                self._index = BM25Index(self.directory)
+                self._mtime = mtime
+                print(f"✅ Loaded BM25 index: {self._index.doc_count} chunks, {len(self._index.segments)} segments")
+            return self._index
@@ -0,0 +1,416 @@
+# agents/rag_agent/vector_store.py
+#
+# Vector stores behind the retriever (VECTOR_STORE):
+#   chroma - the Chroma collection built by build_rag_vectorstore.py (default)
+#   mmap   - an in-process index exported from that collection: float16 or int8 vectors
+#            in memory-mapped .npy files, searched by vectorized brute force or IVF, with
+#            metadata dictionary-encoded in small side arrays. Workers share the pages
+#            through the OS page cache and nothing is parsed at startup.
+#
+# Both answer query()/get()/count() in Chroma's result shape, and version() changes
+# whenever the indexed content does, so retrieval, fusion and
+# reranking do not depend on the store. Export (or re-export after ingestion) with:
+#
+#   python -m agents.rag_agent.vector_store --dtype float16 --nlist 0
+
+import argparse
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")  # chroma | mmap
+MMAP_DTYPE = os.getenv("VECTOR_MMAP_DTYPE", "float16")  # float16 | int8
+MMAP_NLIST = int(os.getenv("VECTOR_MMAP_NLIST", "0"))  # IVF lists; 0 = brute force
+MMAP_NPROBE = int(os.getenv("VECTOR_MMAP_NPROBE", "8"))  # IVF lists scanned per query
+
+CURRENT_FILE = "CURRENT"
+_SCAN_BLOCK = 65536  # rows converted to float32 at a time
+
+
+def mmap_index_directory(persist_directory: str, collection_name: str) -> str:
+    """Where the memory-mapped export of a Chroma collection lives (next to the collection)."""
+    return os.path.join(persist_directory, f"{collection_name}_mmap")
+
+
+def index_version_path(persist_directory: str, collection_name: str) -> str:
+    """Content digest of the indexed files, written by build_rag_vectorstore.py after each run."""
+    return os.path.join(persist_directory, f"{collection_name}_index_version")
+
+
+class ChromaVectorStore:
+    """The persistent Chroma collection, opened on first use."""
+
+    def __init__(self, persist_directory: str, collection_name: str, embedding_function=None):
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.embedding_function = embedding_function
+        self._collection = None
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    import chromadb
+
+                    client = chromadb.PersistentClient(path=self.persist_directory)
+                    self._collection = client.get_or_create_collection(
+                        name=self.collection_name,
+                        embedding_function=self.embedding_function
+                    )
+        return self._collection
+
+    def query(self, **kwargs) -> Dict[str, Any]:
+        return self.collection.query(**kwargs)
+
+    def get(self, **kwargs) -> Dict[str, Any]:
+        return self.collection.get(**kwargs)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def version(self) -> str:
+        try:
+            with open(index_version_path(self.persist_directory, self.collection_name)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return f"count:{self.count()}"  # built before index versions were recorded
+
+
+# === Export ===
+def export_collection(collection, directory: str, dtype: str = MMAP_DTYPE, nlist: int = MMAP_NLIST, page_size: int = 5000) -> int:
+    """Copy every chunk of a Chroma collection (vectors, text, metadata) into a new mmap index version."""
+    ids, documents, metadatas, vectors = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(offset=offset, limit=page_size, include=["documents", "metadatas", "embeddings"])
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page.get("metadatas") or [None] * len(page["ids"]))
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+
+    matrix = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    write_index(directory, ids, matrix, documents, metadatas, dtype=dtype, nlist=nlist)
+    return len(ids)
+
+
+def write_index(
+    directory: str,
+    ids: List[str],
+    vectors: np.ndarray,
+    documents: List[str],
+    metadatas: List[Optional[Dict[str, Any]]],
+    dtype: str = MMAP_DTYPE,
+    nlist: int = MMAP_NLIST,
+):
+    """
+    Write a new index version and switch CURRENT to it atomically. Open readers keep
+    using the previous version until they reload; older versions are removed.
+    """
+    if dtype not in ("float16", "int8"):
+        raise ValueError(f"❌ Unknown mmap vector dtype: {dtype}")
+    version = f"v{time.time_ns()}"
+    path = os.path.join(directory, version)
+    os.makedirs(path)
+
+    count = len(ids)
+    nlist = min(nlist, count // 4) if nlist else 0  # IVF needs a few vectors per list
+    order = np.arange(count)
+    if nlist:
+        centroids, assignment = _kmeans(vectors, nlist)
+        order = np.argsort(assignment, kind="stable")  # each list is a contiguous row range
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignment, minlength=nlist))
+        np.save(os.path.join(path, "centroids.npy"), centroids)
+        np.save(os.path.join(path, "list_offsets.npy"), list_offsets)
+
+    vectors = vectors[order]
+    ids = [ids[i] for i in order]
+    documents = [documents[i] or "" for i in order]
+    metadatas = [metadatas[i] or {} for i in order]
+
+    np.save(os.path.join(path, "norms.npy"), np.einsum("ij,ij->i", vectors, vectors).astype(np.float32))
+    if dtype == "int8":
+        # Symmetric per-row quantization: v ≈ q * scale
+        scales = np.clip(np.abs(vectors).max(axis=1), 1e-12, None) / 127.0 if count else np.zeros(0)
+        np.save(os.path.join(path, "vectors.npy"), np.round(vectors / scales[:, None]).astype(np.int8) if count else vectors.astype(np.int8))
+        np.save(os.path.join(path, "scales.npy"), scales.astype(np.float32))
+    else:
+        np.save(os.path.join(path, "vectors.npy"), vectors.astype(np.float16))
+
+    encoded = [text.encode("utf-8") for text in documents]
+    doc_offsets = np.zeros(count + 1, dtype=np.int64)
+    doc_offsets[1:] = np.cumsum([len(text) for text in encoded])
+    with open(os.path.join(path, "documents.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(path, "doc_offsets.npy"), doc_offsets)
+    with open(os.path.join(path, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(ids, f)
+
+    # Metadata: one int32 code array per key plus its (small) value vocabulary; -1 = missing
+    columns = {}
+    for key in sorted({key for metadata in metadatas for key in metadata}):
+        vocab, codes = {}, np.full(count, -1, dtype=np.int32)
+        for row, metadata in enumerate(metadatas):
+            if key in metadata:
+                codes[row] = vocab.setdefault(metadata[key], len(vocab))
+        filename = f"meta_{len(columns)}_{re.sub(r'[^A-Za-z0-9_]', '_', key)}.npy"
+        np.save(os.path.join(path, filename), codes)
+        columns[key] = {"file": filename, "values": list(vocab)}
+
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"count": count, "dim": int(vectors.shape[1]) if count else 0, "dtype": dtype,
+                   "nlist": nlist, "columns": columns}, f)
+
+    tmp_current = os.path.join(directory, f"{CURRENT_FILE}.tmp")
+    with open(tmp_current, "w") as f:
+        f.write(version)
+    os.replace(tmp_current, os.path.join(directory, CURRENT_FILE))
+
+    for name in os.listdir(directory):
+        if name.startswith("v") and name != version:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 50000, seed: int = 13):
+    """Spherical k-means (inner product) trained on a sample; returns centroids and every row's list."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assignment == c]
+            # Empty lists are re-seeded from a random sample row
+            centroids[c] = members.mean(axis=0) if len(members) else sample[rng.integers(len(sample))]
+        centroids /= np.clip(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12, None)
+
+    assignment = np.concatenate([
+        np.argmax(vectors[start:start + _SCAN_BLOCK] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), _SCAN_BLOCK)
+    ])
+    return centroids.astype(np.float32), assignment
+
+
+# === Read ===
+class MmapVectorIndex:
+    """One exported index version, memory-mapped read-only."""
+
+    def __init__(self, path: str, nprobe: int = MMAP_NPROBE):
+        self.path = path
+        self.nprobe = nprobe
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.dtype = meta["dtype"]
+        self.nlist = meta["nlist"]
+
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode="r")
+        self.vectors = load("vectors.npy")
+        self.norms = load("norms.npy")
+        self.scales = load("scales.npy") if self.dtype == "int8" else None
+        self.doc_offsets = load("doc_offsets.npy")
+        self.centroids = np.load(os.path.join(path, "centroids.npy")) if self.nlist else None
+        self.list_offsets = np.load(os.path.join(path, "list_offsets.npy")) if self.nlist else None
+        self.columns = {key: (load(column["file"]), column["values"]) for key, column in meta["columns"].items()}
+
+        with open(os.path.join(path, "ids.json"), encoding="utf-8") as f:
+            self.ids = json.load(f)
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+        with open(os.path.join(path, "documents.bin"), "rb") as f:
+            self._documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(f.name) else b""
+
+    def search(self, queries: np.ndarray, k: int, where: Optional[Dict[str, Any]] = None):
+        """Per query: (rows, squared L2 distances), closest first, as Chroma's default space reports."""
+        queries = np.asarray(queries, dtype=np.float32)
+        mask = self.filter(where)
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+
+        if not self.nlist:
+            dots = np.empty((self.count, len(queries)), dtype=np.float32)
+            for start in range(0, self.count, _SCAN_BLOCK):
+                dots[start:start + _SCAN_BLOCK] = self._dot(start, min(start + _SCAN_BLOCK, self.count), queries)
+            rows = np.arange(self.count)
+            return [self._top_k(rows, dots[:, q], query_norms[q], mask, k) for q in range(len(queries))]
+
+        results = []
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+        for q, lists in enumerate(probes):
+            ranges = [(int(self.list_offsets[l]), int(self.list_offsets[l + 1])) for l in lists]
+            rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+            dots = np.concatenate([self._dot(start, end, queries[q:q + 1])[:, 0] for start, end in ranges])
+            results.append(self._top_k(rows, dots, query_norms[q], mask, k))
+        return results
+
+    def _dot(self, start: int, end: int, queries: np.ndarray) -> np.ndarray:
+        dots = self.vectors[start:end].astype(np.float32) @ queries.T
+        if self.scales is not None:
+            dots *= self.scales[start:end, None]
+        return dots
+
+    def _top_k(self, rows: np.ndarray, dots: np.ndarray, query_norm: float, mask: Optional[np.ndarray], k: int):
+        distances = self.norms[rows] + query_norm - 2 * dots
+        if mask is not None:
+            keep = mask[rows]
+            rows, distances = rows[keep], distances[keep]
+        if len(rows) > k:
+            top = np.argpartition(distances, k)[:k]
+            rows, distances = rows[top], distances[top]
+        order = np.argsort(distances)
+        return rows[order], distances[order]
+
+    def filter(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean row mask for a Chroma-style where clause ($and/$or, $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte)."""
+        if not where:
+            return None
+        masks = []
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                parts = [self.filter(clause) for clause in condition]
+                masks.append(np.logical_and.reduce(parts) if key == "$and" else np.logical_or.reduce(parts))
+                continue
+            operator, operand = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+            masks.append(self._match(key, operator, operand))
+        return np.logical_and.reduce(masks)
+
+    _OPERATORS = {
+        "$eq": lambda value, operand: value == operand,
+        "$ne": lambda value, operand: value != operand,
+        "$in": lambda value, operand: value in operand,
+        "$nin": lambda value, operand: value not in operand,
+        "$gt": lambda value, operand: value > operand,
+        "$gte": lambda value, operand: value >= operand,
+        "$lt": lambda value, operand: value < operand,
+        "$lte": lambda value, operand: value <= operand,
+    }
+
+    def _match(self, key: str, operator: str, operand) -> np.ndarray:
+        if operator not in self._OPERATORS:
+            raise ValueError(f"❌ Unsupported filter operator for the mmap store: {operator}")
+        if key not in self.columns:
+            return np.zeros(self.count, dtype=bool)
+        codes, values = self.columns[key]
+        test = self._OPERATORS[operator]
+        # Evaluate on the vocabulary once, then look rows up by code (index -1 → the trailing False)
+        table = np.zeros(len(values) + 1, dtype=bool)
+        for code, value in enumerate(values):
+            try:
+                table[code] = test(value, operand)
+            except TypeError:
+                pass  # e.g. comparing a string value with a number
+        return table[codes]
+
+    def document(self, row: int) -> str:
+        return bytes(self._documents[int(self.doc_offsets[row]):int(self.doc_offsets[row + 1])]).decode("utf-8")
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        metadata = {}
+        for key, (codes, values) in self.columns.items():
+            code = int(codes[row])
+            if code >= 0:
+                metadata[key] = values[code]
+        return metadata
+
+
+class MmapVectorStore:
+    """
+    The exported mmap index for the server, in Chroma's query/get result shape. Reopened
+    when an export switches CURRENT (checked at most every `check_interval` seconds).
+    """
+
+    def __init__(self, directory: str, embedding_function=None, nprobe: int = MMAP_NPROBE, check_interval: float = 30.0):
+        self.directory = directory
+        self.embedding_function = embedding_function
+        self.nprobe = nprobe
+        self.check_interval = check_interval
+        self._index: Optional[MmapVectorIndex] = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def index(self) -> MmapVectorIndex:
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.check_interval:
+            return self._index
+        with self._lock:
+            self._checked_at = now
+            try:
+                with open(os.path.join(self.directory, CURRENT_FILE)) as f:
+                    version = f.read().strip()
+            except FileNotFoundError:
+                raise RuntimeError(f"❌ No mmap vector index in {self.directory}; run python -m agents.rag_agent.vector_store")
+            if self._index is None or version != self._version:
+                self._index = MmapVectorIndex(os.path.join(self.directory, version), nprobe=self.nprobe)
+                self._version = version
+                print(f"✅ Loaded mmap vector index: {self._index.count} chunks ({self._index.dtype}, nlist={self._index.nlist})")
+            return self._index
+
+    def query(self, query_texts=None, query_embeddings=None, n_results: int = 10, where=None, **_) -> Dict[str, Any]:
+        index = self.index()
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(list(query_texts))
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for rows, distances in index.search(np.asarray(query_embeddings, dtype=np.float32), n_results, where):
+            results["ids"].append([index.ids[row] for row in rows])
+            results["documents"].append([index.document(row) for row in rows])
+            results["metadatas"].append([index.metadata(row) for row in rows])
+            results["distances"].append([float(d) for d in distances])
+        return results
+
+    def get(self, ids: List[str], where=None, **_) -> Dict[str, Any]:
+        index = self.index()
+        mask = index.filter(where)
+        rows = [index.rows[chunk_id] for chunk_id in ids if chunk_id in index.rows]
+        rows = [row for row in rows if mask is None or mask[row]]
+        return {
+            "ids": [index.ids[row] for row in rows],
+            "documents": [index.document(row) for row in rows],
+            "metadatas": [index.metadata(row) for row in rows],
+        }
+
+    def count(self) -> int:
+        return self.index().count
+
+    def version(self) -> str:
+        self.index()
+        return self._version
+
+
+def create_vector_store(kind: str, persist_directory: str, collection_name: str, embedding_function=None):
+    if kind == "chroma":
+        return ChromaVectorStore(persist_directory, collection_name, embedding_function)
+    if kind == "mmap":
+        return MmapVectorStore(mmap_index_directory(persist_directory, collection_name), embedding_function)
+    raise ValueError(f"❌ Unknown VECTOR_STORE: {kind}")
+
+
+if __name__ == "__main__":
+    from agents.rag_agent.build_rag_vectorstore import CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY, get_collection
+
+    parser = argparse.ArgumentParser(description="Export the Chroma collection to the memory-mapped vector index")
+    parser.add_argument("--persist-directory", default=CHROMA_PERSIST_DIRECTORY)
+    parser.add_argument("--collection", default=CHROMA_COLLECTION_NAME)
+    parser.add_argument("--dtype", default=MMAP_DTYPE, choices=["float16", "int8"])
+    parser.add_argument("--nlist", type=int, default=MMAP_NLIST, help="IVF lists (0 = brute force)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    exported = export_collection(
+        get_collection(args.persist_directory, args.collection),
+        mmap_index_directory(args.persist_directory, args.collection),
+        dtype=args.dtype,
+        nlist=args.nlist,
+    )
+    print(f"✅ Exported {exported} chunks ({args.dtype}, nlist={args.nlist}) in {time.perf_counter() - start:.1f}s")
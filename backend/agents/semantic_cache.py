@@ -0,0 +1,261 @@
+# agents/semantic_cache.py
+
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from agents.llm_loader import get_embedding_service
+
+
+@dataclass
+class CacheEntry:
+    query: str
+    vector: np.ndarray
+    response: str
+    sources: List[Dict[str, str]]
+    agent: str
+    version: Any
+    created_at: float
+    last_used: float
+    size_bytes: int = field(default=0)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial variants share a key."""
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return re.sub(r"\s+", " ", query).strip()
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on query embeddings.
+
+    Entries live in per-agent namespaces. A lookup first tries the exact normalized
+    query, then the nearest neighbour in the namespace above the similarity threshold.
+    Entries expire after a TTL (per producing agent where set), the least recently used entry is evicted when either
+    the entry limit or the memory cap is reached, and a namespace can be tied to a
+    version function (e.g. the Chroma collection size) so stale answers are dropped.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        version_check_seconds: Optional[float] = None,
+    ):
+        self.threshold = threshold if threshold is not None else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("SEMANTIC_CACHE_MAX_MB", "64")) * 1024 * 1024
+        self.version_check_seconds = (
+            version_check_seconds if version_check_seconds is not None
+            else float(os.getenv("SEMANTIC_CACHE_VERSION_CHECK_SECONDS", "30"))
+        )
+
+        self._namespaces: Dict[str, "OrderedDict[str, CacheEntry]"] = {}
+        self._matrices: Dict[str, Optional[tuple]] = {}
+        self._version_fns: Dict[str, Callable[[], Any]] = {}
+        self._versions: Dict[str, tuple] = {}
+        self._ttls: Dict[str, float] = {}
+        self._recent_vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._embedding_model = None
+        self._lock = threading.RLock()
+        self.stats = Counter()
+
+    def register_version(self, namespace: str, version_fn: Callable[[], Any]):
+        """Invalidate a namespace whenever version_fn() changes (checked at most every few seconds)."""
+        with self._lock:
+            self._version_fns[namespace] = version_fn
+
+    def set_ttl(self, agent: str, ttl_seconds: float):
+        """TTL for answers produced by agent, in any namespace (e.g. short-lived web answers)."""
+        with self._lock:
+            self._ttls[agent] = ttl_seconds
+
+    def lookup(self, namespace: str, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"response", "sources", "agent", "similarity"} for a cached answer, or None.
+        """
+        key = normalize_query(query)
+        version = self._current_version(namespace)
+
+        with self._lock:
+            entries = self._namespaces.get(namespace)
+            if entries:
+                entry = entries.get(key)
+                if entry is not None and self._is_fresh(entry, version):
+                    self._touch(entries, key)
+                    self.stats["hits"] += 1
+                    self.stats["exact_hits"] += 1
+                    return self._as_result(entry, 1.0)
+
+        vector = self._embed(key)
+
+        with self._lock:
+            entries = self._namespaces.get(namespace)
+            if not entries:
+                self.stats["misses"] += 1
+                return None
+
+            keys, matrix = self._matrix(namespace)
+            similarities = matrix @ vector
+            for index in np.argsort(similarities)[::-1]:
+                similarity = float(similarities[index])
+                if similarity < self.threshold:
+                    break
+                entry = entries.get(keys[index])
+                if entry is None:
+                    continue
+                if not self._is_fresh(entry, version):
+                    self._remove(namespace, keys[index])
+                    self.stats["expired"] += 1
+                    continue
+                self._touch(entries, keys[index])
+                self.stats["hits"] += 1
+                self.stats["semantic_hits"] += 1
+                return self._as_result(entry, similarity)
+
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, namespace: str, query: str, response: str, sources: Optional[List[Dict[str, str]]] = None, agent: str = ""):
+        """Cache an answer for the query in the namespace."""
+        key = normalize_query(query)
+        vector = self._embed(key)
+        version = self._current_version(namespace)
+        sources = sources or []
+
+        entry = CacheEntry(
+            query=key,
+            vector=vector,
+            response=response,
+            sources=sources,
+            agent=agent or namespace,
+            version=version,
+            created_at=time.monotonic(),
+            last_used=time.monotonic(),
+            size_bytes=vector.nbytes + len(key) + len(response.encode("utf-8")) + sum(len(str(s)) for s in sources),
+        )
+
+        with self._lock:
+            entries = self._namespaces.setdefault(namespace, OrderedDict())
+            if key in entries:
+                self._remove(namespace, key)
+            entries[key] = entry
+            self._bytes += entry.size_bytes
+            self._matrices[namespace] = None
+            self.stats["stores"] += 1
+            self._evict()
+
+    def invalidate(self, namespace: Optional[str] = None):
+        """Drop one namespace, or everything when namespace is None."""
+        with self._lock:
+            for name in [namespace] if namespace else list(self._namespaces):
+                for key in list(self._namespaces.get(name, {})):
+                    self._remove(name, key)
+            self.stats["invalidations"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **dict(self.stats),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "entries": sum(len(entries) for entries in self._namespaces.values()),
+                "bytes": self._bytes,
+                "threshold": self.threshold,
+            }
+
+    # --- internals -------------------------------------------------------
+
+    def _embed(self, key: str) -> np.ndarray:
+        with self._lock:
+            vector = self._recent_vectors.get(key)
+            if vector is not None:
+                self._recent_vectors.move_to_end(key)
+                return vector
+            if self._embedding_model is None:
+                self._embedding_model = get_embedding_service()
+
+        vector = np.asarray(self._embedding_model.embed_query(key), dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+
+        with self._lock:
+            self._recent_vectors[key] = vector
+            if len(self._recent_vectors) > 256:
+                self._recent_vectors.popitem(last=False)
+        return vector
+
+    def _matrix(self, namespace: str):
+        cached = self._matrices.get(namespace)
+        if cached is None:
+            entries = self._namespaces[namespace]
+            keys = list(entries)
+            cached = (keys, np.stack([entries[k].vector for k in keys]))
+            self._matrices[namespace] = cached
+        return cached
+
+    def _current_version(self, namespace: str):
+        version_fn = self._version_fns.get(namespace)
+        if version_fn is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            checked_at, version = self._versions.get(namespace, (None, None))
+        if checked_at is None or now - checked_at >= self.version_check_seconds:
+            # version_fn may touch the disk or the vector store: call it outside the lock
+            try:
+                version = version_fn()
+            except Exception as e:
+                print(f"[SemanticCache] version check failed for {namespace}: {e}")
+            with self._lock:
+                self._versions[namespace] = (now, version)
+        return version
+
+    def _is_fresh(self, entry: CacheEntry, version) -> bool:
+        if time.monotonic() - entry.created_at > self._ttls.get(entry.agent, self.ttl_seconds):
+            return False
+        return entry.version == version
+
+    @staticmethod
+    def _touch(entries: "OrderedDict[str, CacheEntry]", key: str):
+        entries[key].last_used = time.monotonic()
+        entries.move_to_end(key)
+
+    def _remove(self, namespace: str, key: str):
+        entry = self._namespaces[namespace].pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size_bytes
+            self._matrices[namespace] = None
+
+    def _evict(self):
+        while self._namespaces and (
+            sum(len(entries) for entries in self._namespaces.values()) > self.max_entries
+            or self._bytes > self.max_bytes
+        ):
+            # Each namespace is LRU-ordered; evict the oldest head across namespaces
+            candidates = [(name, next(iter(entries))) for name, entries in self._namespaces.items() if entries]
+            if not candidates:
+                break
+            name, key = min(candidates, key=lambda item: self._namespaces[item[0]][item[1]].last_used)
+            self._remove(name, key)
+            self.stats["evictions"] += 1
+
+    @staticmethod
+    def _as_result(entry: CacheEntry, similarity: float) -> Dict[str, Any]:
+        return {
+            "response": entry.response,
+            "sources": entry.sources,
+            "agent": entry.agent,
+            "similarity": similarity,
+        }
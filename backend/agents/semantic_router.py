@@ -0,0 +1,130 @@
+# agents/semantic_router.py
+
+import os
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from agents.history_manager import is_follow_up, last_user_message
+from agents.llm_loader import get_embedding_service
+
+# ✅ Labelled prototypes: what a typical query for each agent looks like
+ROUTE_EXAMPLES = {
+    "CONVERSATION_AGENT": [
+        "hi",
+        "hello, can you help me?",
+        "thanks for the help",
+        "I have had a headache since this morning, what should I do?",
+        "I feel tired all the time",
+        "can you explain that in simpler words?",
+        "my throat is sore and I have a mild fever",
+        "is it okay to exercise when I have a cold?",
+        "what can I do to sleep better?",
+        "give me a single solution",
+    ],
+    "RAG_AGENT": [
+        "what are the diagnostic criteria for type 2 diabetes?",
+        "what is the recommended dosage of metformin?",
+        "explain the pathophysiology of heart failure",
+        "what are the first-line treatments for hypertension according to guidelines?",
+        "list the symptoms and complications of chronic kidney disease",
+        "what does the guideline say about asthma management in children?",
+        "what are the contraindications of aspirin?",
+        "summarize the staging of breast cancer in a table",
+        "what are the risk factors for stroke?",
+        "how is community acquired pneumonia treated?",
+    ],
+    "WEB_SEARCH_PROCESSOR_AGENT": [
+        "what are the latest research findings on Alzheimer's disease?",
+        "any news about the new weight loss drugs this year?",
+        "what is the current status of the bird flu outbreak?",
+        "recent clinical trials for pancreatic cancer",
+        "has the FDA approved any new migraine drugs recently?",
+        "what are the newest COVID-19 vaccine recommendations?",
+        "latest treatment options for long covid",
+        "which hospitals are best for cardiac surgery right now?",
+        "recent studies on intermittent fasting",
+        "what is the newest research on gene therapy for sickle cell?",
+    ],
+}
+
+
+class SemanticRouter:
+    """
+    Routes a query by MiniLM similarity to labelled prototypes.
+
+    Each label is scored by the mean of its top-k prototype similarities; the route is
+    only returned when the best score clears ROUTER_MIN_SCORE and beats the runner-up
+    by ROUTER_MARGIN, otherwise None so the caller can ask the LLM. Follow-ups ("what about
+    in children?") are routed together with the previous user message.
+    """
+
+    def __init__(self, min_score: Optional[float] = None, margin: Optional[float] = None, top_k: int = 3):
+        self.min_score = min_score if min_score is not None else float(os.getenv("ROUTER_MIN_SCORE", "0.45"))
+        self.margin = margin if margin is not None else float(os.getenv("ROUTER_MARGIN", "0.08"))
+        self.top_k = top_k
+
+        self._embedding_model = None
+        self._labels = list(ROUTE_EXAMPLES)
+        self._matrices = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = Counter()
+
+    def scores(self, query: str) -> dict:
+        """Similarity score per label for the query."""
+        self._ensure_prototypes()
+        vector = _normalize_rows(np.asarray([self._embedding_model.embed_query(query)], dtype=np.float32))[0]
+
+        scores = {}
+        for label, matrix in zip(self._labels, self._matrices):
+            similarities = np.sort(matrix @ vector)[::-1][: self.top_k]
+            scores[label] = float(similarities.mean())
+        return scores
+
+    def route(self, query: str, history: Optional[List] = None) -> Tuple[Optional[str], float]:
+        """
+        Returns (agent_name, margin), or (None, margin) when the decision is not confident.
+        """
+        previous = last_user_message(history) if is_follow_up(query) else None
+        text = f"{previous} {query}" if previous else query
+        ranked = sorted(self.scores(text).items(), key=lambda item: item[1], reverse=True)
+        (best_label, best_score), (_, second_score) = ranked[0], ranked[1]
+        margin = best_score - second_score
+
+        decided = best_score >= self.min_score and margin >= self.margin
+        with self._stats_lock:
+            self.stats["local" if decided else "fallback"] += 1
+            if previous:
+                self.stats["follow_up"] += 1
+        return (best_label if decided else None), margin
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            local, fallback, follow_up = self.stats["local"], self.stats["fallback"], self.stats["follow_up"]
+        total = local + fallback
+        return {
+            "local": local,
+            "llm_fallback": fallback,
+            "follow_ups": follow_up,
+            "local_fraction": local / total if total else 0.0,
+        }
+
+    def _ensure_prototypes(self):
+        if self._matrices is not None:
+            return
+        with self._lock:
+            if self._matrices is not None:
+                return
+            self._embedding_model = get_embedding_service()
+            self._matrices = [
+                _normalize_rows(np.asarray(self._embedding_model.embed_documents(ROUTE_EXAMPLES[label]), dtype=np.float32))
+                for label in self._labels
+            ]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
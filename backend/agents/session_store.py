@@ -0,0 +1,191 @@
+# agents/session_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List
+
+
+# ✅ Compact serialization: LangChain message dicts → compact JSON → zlib
+def serialize_messages(messages: List["BaseMessage"]) -> bytes:
+    from langchain_core.messages import messages_to_dict
+
+    payload = json.dumps(messages_to_dict(messages), separators=(",", ":"), ensure_ascii=False)
+    return zlib.compress(payload.encode("utf-8"), level=6)
+
+
+def deserialize_messages(blob: bytes) -> List["BaseMessage"]:
+    from langchain_core.messages import messages_from_dict
+
+    return messages_from_dict(json.loads(zlib.decompress(blob).decode("utf-8")))
+
+
+class SessionStore(ABC):
+    """Interface for chat history storage, keyed by session id."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> List["BaseMessage"]:
+        ...
+
+    @abstractmethod
+    def set(self, session_id: str, messages: List["BaseMessage"]):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    def get_stats(self) -> dict:
+        return {}
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Per-worker LRU store. Sessions are kept compressed; the least recently used
+    session is dropped when the session count or the total byte cap is exceeded,
+    and sessions idle for longer than the TTL expire.
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_ttl_seconds: float = 3600, max_bytes: int = 256 * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()  # session_id -> (blob, last_access)
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> List["BaseMessage"]:
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return []
+            blob, last_access = item
+            if time.monotonic() - last_access > self.idle_ttl_seconds:
+                self._pop(session_id)
+                return []
+            self._sessions[session_id] = (blob, time.monotonic())
+            self._sessions.move_to_end(session_id)
+        return deserialize_messages(blob)
+
+    def set(self, session_id: str, messages: List["BaseMessage"]):
+        blob = serialize_messages(messages)
+        with self._lock:
+            self._pop(session_id)
+            self._sessions[session_id] = (blob, time.monotonic())
+            self._bytes += len(blob)
+            self._evict()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._pop(session_id)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "bytes": self._bytes, "evictions": self._evictions}
+
+    def _pop(self, session_id: str):
+        item = self._sessions.pop(session_id, None)
+        if item is not None:
+            self._bytes -= len(item[0])
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest first: stop at the first session that is neither idle nor over a cap
+        while self._sessions:
+            session_id, (blob, last_access) = next(iter(self._sessions.items()))
+            over_cap = len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+            if not over_cap and now - last_access <= self.idle_ttl_seconds:
+                break
+            self._pop(session_id)
+            self._evictions += 1
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    On-disk store shared by every uvicorn worker on the host (SQLite in WAL mode).
+    Idle sessions are pruned periodically.
+    """
+
+    def __init__(self, path: str = "sessions.db", idle_ttl_seconds: float = 3600, prune_interval_seconds: float = 300):
+        self.path = path
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.prune_interval_seconds = prune_interval_seconds
+        self._local = threading.local()
+        self._last_prune = 0.0
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> List["BaseMessage"]:
+        row = self._connection().execute(
+            "SELECT data, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.idle_ttl_seconds:
+            return []
+        return deserialize_messages(row[0])
+
+    def set(self, session_id: str, messages: List["BaseMessage"]):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (session_id, serialize_messages(messages), time.time()),
+            )
+        self._maybe_prune()
+
+    def delete(self, session_id: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def get_stats(self) -> dict:
+        count, size = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+        return {"backend": "sqlite", "path": self.path, "sessions": count, "bytes": size}
+
+    def _maybe_prune(self):
+        now = time.time()
+        if now - self._last_prune < self.prune_interval_seconds:
+            return
+        self._last_prune = now
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.idle_ttl_seconds,))
+
+
+def create_session_store() -> SessionStore:
+    """
+    Build the store selected by SESSION_STORE (memory | sqlite).
+    """
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    idle_ttl_seconds = float(os.getenv("SESSION_TIMEOUT_MINUTES", "60")) * 60
+
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            path=os.getenv("SESSION_DB_PATH", "sessions.db"),
+            idle_ttl_seconds=idle_ttl_seconds,
+        )
+    if backend == "memory":
+        return InMemorySessionStore(
+            max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+            idle_ttl_seconds=idle_ttl_seconds,
+            max_bytes=int(os.getenv("SESSION_MAX_MB", "256")) * 1024 * 1024,
+        )
+    raise ValueError(f"❌ Unknown SESSION_STORE backend: {backend}")
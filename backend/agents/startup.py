@@ -0,0 +1,50 @@
+# agents/startup.py
+
+import threading
+import time
+from typing import Callable, Dict, Iterable
+
+
+class WarmupTracker:
+    """
+    Records the warm-up state of each backend component (pending → warming → ready/failed)
+    with how long it took, for /readyz and the startup log.
+    """
+
+    def __init__(self, components: Iterable[str]):
+        self._lock = threading.Lock()
+        self._components: Dict[str, dict] = {name: {"state": "pending"} for name in components}
+
+    def run(self, name: str, loader: Callable[[], object]):
+        """Run one component's loader (blocking) and record the outcome; re-raises failures."""
+        with self._lock:
+            current = self._components.setdefault(name, {"state": "pending"})
+            if current["state"] == "ready":
+                return
+            current.update(state="warming", started_at=time.time())
+
+        start = time.perf_counter()
+        try:
+            loader()
+        except Exception as e:
+            with self._lock:
+                self._components[name].update(state="failed", error=str(e), seconds=round(time.perf_counter() - start, 3))
+            print(f"❌ Warm-up of {name} failed: {e}")
+            raise
+
+        seconds = round(time.perf_counter() - start, 3)
+        with self._lock:
+            self._components[name].update(state="ready", seconds=seconds)
+        print(f"✅ Warmed up {name} in {seconds:.2f}s")
+
+    def is_ready(self, name: str) -> bool:
+        with self._lock:
+            return self._components.get(name, {}).get("state") == "ready"
+
+    def all_ready(self) -> bool:
+        with self._lock:
+            return all(c["state"] == "ready" for c in self._components.values())
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: dict(info) for name, info in self._components.items()}
@@ -0,0 +1,37 @@
+# agents/token_utils.py
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken's cl100k_base (a close proxy for Llama 3); ~4 chars/token if unavailable."""
+    encoding = _get_encoding()
+    if encoding is False:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of text within max_tokens, cut back to a word boundary."""
+    encoding = _get_encoding()
+    if encoding is False:
+        if len(text) <= max_tokens * 4:
+            return text
+        prefix = text[:max_tokens * 4]
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        prefix = encoding.decode(tokens[:max_tokens])
+    return prefix.rsplit(" ", 1)[0] if " " in prefix else prefix
@@ -104,23 +104,21 @@
 
 
 import os
+import io
+import base64
+from typing import BinaryIO, Union
 from PIL import Image as PILImage
 from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage
 from langchain_core.output_parsers import StrOutputParser
-from langchain_tavily import TavilySearch
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
+from agents.async_utils import run_sync
+from agents.llm_loader import get_vision_llm, get_tavily_search
+from agents.web_search.search_cache import web_search_cache
 
 load_dotenv()
 
-# ✅ Vision model from Groq
-llm = ChatGroq(
-    model="meta-llama/llama-4-scout-17b-16e-instruct",
-    temperature=0.3,
-)
-
-# ✅ Tavily tool
-search_tool = TavilySearch()
+# ✅ Vision model from Groq and Tavily tool come from the shared registry (loaded on first use)
 
 # ✅ Prompt
 IMAGE_ANALYSIS_QUERY = """
@@ -149,64 +147,125 @@ You are a top-tier medical imaging expert. Carefully analyze the uploaded medica
 Respond in clean markdown format.
 """
 
-# ✅ Analyzer function
-def analyze_image(filepath: str) -> str:
+# ✅ Image preparation (validate, resize, base64-encode into a vision message) — all in memory,
+# so concurrent analyses share no files
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+TARGET_WIDTH = 500
+
+ImageInput = Union[bytes, bytearray, memoryview, BinaryIO, str]
+
+def _open_image(image: ImageInput):
+    """
+    (PIL image, size in bytes) for raw bytes, a binary buffer, or a file path. Bytes are
+    wrapped, not copied; PIL reads the header only and decodes later, once.
+    """
+    if isinstance(image, str):
+        return PILImage.open(image), os.path.getsize(image)
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return PILImage.open(io.BytesIO(image)), len(image)
+    position = image.tell()
+    size = image.seek(0, io.SEEK_END) - position
+    image.seek(position)
+    return PILImage.open(image), size
+
+def encode_image(image: ImageInput) -> str:
+    """
+    Base64 JPEG of the image scaled to TARGET_WIDTH. JPEGs are decoded in draft mode (the
+    decoder downscales by 1/2-1/8 while decoding), so large photos never decode at full size.
+    Raises ValueError with a user-facing message if the image is rejected.
+    """
+    picture, size = _open_image(image)
+    if picture.format not in ["JPEG", "PNG", "BMP", "GIF"]:
+        raise ValueError("❌ Unsupported image format. Please upload JPG, PNG, BMP, or GIF.")
+    if size > MAX_IMAGE_BYTES:
+        raise ValueError("❌ Image too large. Please upload an image smaller than 10MB.")
+
+    width, height = picture.size
+    new_height = max(1, int((TARGET_WIDTH / width) * height))
+    picture.draft("RGB", (TARGET_WIDTH, new_height))  # no-op for formats other than JPEG
+    if picture.mode not in ("RGB", "L"):
+        picture = picture.convert("RGB")
+    resized = picture.resize((TARGET_WIDTH, new_height))
+
+    buffer = io.BytesIO()
+    resized.save(buffer, format="JPEG")
+    return base64.b64encode(buffer.getbuffer()).decode("ascii")
+
+def _prepare_image_message(image: ImageInput):
+    """
+    Returns (message, None) ready for the vision model, or (None, error_text) if the image is rejected.
+    """
     try:
-        # Open and validate
-        image = PILImage.open(filepath)
-        if image.format not in ["JPEG", "PNG", "BMP", "GIF"]:
-            return "❌ Unsupported image format. Please upload JPG, PNG, BMP, or GIF."
-        if os.path.getsize(filepath) > 10 * 1024 * 1024:
-            return "❌ Image too large. Please upload an image smaller than 10MB."
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-
-        # Resize
-        width, height = image.size
-        new_width = 500
-        new_height = int((new_width / width) * height)
-        resized = image.resize((new_width, new_height))
-        temp_path = "temp_resized_image.jpg"
-        resized.save(temp_path)
-
-        # Prepare image data
-        with open(temp_path, "rb") as f:
-            image_bytes = f.read()
-
-        # Encode image to base64 for Groq vision model
-        import base64
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-        
-        # Create message with image content
-        from langchain_core.messages import HumanMessage
-        message_with_image = HumanMessage(
-            content=[
-                {"type": "text", "text": IMAGE_ANALYSIS_QUERY},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{image_base64}"
-                    }
+        image_base64 = encode_image(image)
+    except ValueError as e:
+        return None, str(e)
+
+    # Create message with image content
+    message_with_image = HumanMessage(
+        content=[
+            {"type": "text", "text": IMAGE_ANALYSIS_QUERY},
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:image/jpeg;base64,{image_base64}"
                 }
-            ]
-        )
-        
-        # Invoke the vision model directly
-        result = llm.invoke([message_with_image]).content
+            }
+        ]
+    )
+    return message_with_image, None
+
+# ✅ Tavily search (handling proper dict response)
+def _research_footer(result: str) -> str:
+    query = "latest research on " + result[:100]
+    try:
+        search_result = web_search_cache.search(query, lambda q: get_tavily_search().invoke({"query": q}), namespace="tavily:5")
+    except Exception as e:
+        print(f"⚠️ Research links skipped: {e}")  # e.g. rate limited; the analysis itself is unaffected
+        return ""
 
-        # ✅ Tavily search (handling proper dict response)
-        query = "latest research on " + result[:100]
-        search_result = search_tool.invoke(query)
+    footer = ""
+    if search_result and isinstance(search_result, dict) and "results" in search_result:
+        footer += "\n\n---\n\n### 🔍 Additional Research :\n"
+        for doc in search_result["results"][:3]:
+            footer += f"- [{doc.get('title', 'No Title')}]({doc.get('url', '#')})\n"
+    return footer
 
-        if search_result and isinstance(search_result, dict) and "results" in search_result:
-            result += "\n\n---\n\n### 🔍 Additional Research :\n"
-            for doc in search_result["results"][:3]:
-                result += f"- [{doc.get('title', 'No Title')}]({doc.get('url', '#')})\n"
+# ✅ Analyzer function
+def analyze_image(image: ImageInput) -> str:
+    try:
+        message_with_image, error = _prepare_image_message(image)
+        if error:
+            return error
 
-        os.remove(temp_path)
+        # Invoke the vision model directly
+        result = get_vision_llm().invoke([message_with_image]).content
+        result += _research_footer(result)
         return result
 
     except PILImage.UnidentifiedImageError:
         return "❌ The uploaded file is not a valid image."
     except Exception as e:
         return f"⚠️ Error analyzing image: {str(e)}"
+
+# ✅ Streaming analyzer: report tokens as the vision model produces them, research links last
+async def astream_analyze_image(image: ImageInput):
+    try:
+        message_with_image, error = await run_sync(_prepare_image_message, image)
+        if error:
+            yield error
+            return
+
+        result = ""
+        async for chunk in get_vision_llm().astream([message_with_image]):
+            if chunk.content:
+                result += chunk.content
+                yield chunk.content
+
+        footer = await run_sync(_research_footer, result)
+        if footer:
+            yield footer
+
+    except PILImage.UnidentifiedImageError:
+        yield "❌ The uploaded file is not a valid image."
+    except Exception as e:
+        yield f"⚠️ Error analyzing image: {str(e)}"
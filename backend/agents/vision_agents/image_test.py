@@ -1,9 +1,11 @@
 # test_image_analysis.py
+# Run from the backend directory: python -m agents.vision_agents.image_test
 
-from image_analysis_agent import analyze_image
+import os
+from agents.vision_agents.image_analysis_agent import analyze_image
 
 if __name__ == "__main__":
-    test_image_path = "test_img.jpeg"  # Replace with your image path
+    test_image_path = os.path.join(os.path.dirname(__file__), "test_img.jpeg")  # Replace with your image path
     print("Analyzing image:", test_image_path)
 
     try:
@@ -0,0 +1,301 @@
+# agents/web_search/search_cache.py
+#
+# Cache in front of every Tavily call (web search agent and the image agent's research
+# links). We pay per call and its latency is unpredictable, so:
+#   - results are cached per normalized query, in memory (LRU) and in SQLite (survives
+#     restarts, shared by workers on the host), with a shorter TTL for time-sensitive
+#     queries ("latest research on ...");
+#   - concurrent identical queries share one API call (single flight);
+#   - API calls are rate limited per minute; callers over the limit queue for a slot.
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Optional
+
+from agents.async_utils import run_sync
+
+# Queries asking for recent information expire sooner
+_TIME_SENSITIVE = re.compile(r"\b(latest|recent|new|newest|current|today|this (?:week|month|year)|news|update[sd]?|20\d\d)\b", re.IGNORECASE)
+
+
+def normalize_search_query(query: str) -> str:
+    return " ".join(query.lower().strip().strip("\"'").split()).strip(" ?.!")
+
+
+class RateLimitExceeded(Exception):
+    """Raised when the queue for a rate-limit slot is longer than the caller may wait."""
+
+
+class RateLimiter:
+    """
+    At most `per_minute` calls in any 60 s window. Callers reserve slots in arrival order
+    and wait for theirs (FIFO queueing); a slot further away than `max_wait` is refused.
+    """
+
+    def __init__(self, per_minute: int, max_wait: float):
+        self.per_minute = per_minute
+        self.max_wait = max_wait
+        self._slots = deque()  # start times of the last `per_minute` reserved calls
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reserve the next slot; returns how many seconds to wait for it."""
+        if self.per_minute <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = now if len(self._slots) < self.per_minute else max(now, self._slots[0] + 60.0)
+            if slot - now > self.max_wait:
+                raise RateLimitExceeded(f"web search rate limit ({self.per_minute}/min) queue is {slot - now:.0f}s long")
+            if len(self._slots) == self.per_minute:
+                self._slots.popleft()
+            self._slots.append(slot)
+            return slot - now
+
+
+class WebSearchCache:
+    """
+    Two-tier (memory LRU + SQLite) TTL cache with single-flight and rate limiting around
+    a search function. Failed searches are not cached.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        ttl_seconds: float = None,
+        fresh_ttl_seconds: float = None,
+        max_entries: int = None,
+        per_minute: int = None,
+        max_wait_seconds: float = None,
+    ):
+        self.db_path = db_path if db_path is not None else os.getenv("WEB_SEARCH_CACHE_DB_PATH", "web_search_cache.db")
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", "86400"))
+        self.fresh_ttl_seconds = fresh_ttl_seconds if fresh_ttl_seconds is not None else float(os.getenv("WEB_SEARCH_FRESH_TTL_SECONDS", "21600"))
+        self.max_entries = max_entries or int(os.getenv("WEB_SEARCH_CACHE_MAX_ENTRIES", "2000"))
+        self.rate_limiter = RateLimiter(
+            per_minute if per_minute is not None else int(os.getenv("WEB_SEARCH_RATE_PER_MINUTE", "60")),
+            max_wait_seconds if max_wait_seconds is not None else float(os.getenv("WEB_SEARCH_MAX_QUEUE_SECONDS", "20")),
+        )
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (result, expires_at wall clock)
+        self._in_flight = {}  # key -> Future shared by concurrent callers
+        self._tasks = set()  # async calls in flight (referenced so they are not collected)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._table_ready = False
+        self.stats = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "api_calls": 0,
+            "api_errors": 0, "rate_limited_waits": 0, "rate_limit_rejections": 0,
+        }
+        self._api_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    # --- public API ------------------------------------------------------
+
+    def search(self, query: str, fetch: Callable[[str], Any], namespace: str = "tavily") -> Any:
+        """Cached fetch(query); concurrent identical queries share one call."""
+        key = self._key(namespace, query)
+        result = self._lookup(key)
+        if result is not None:
+            return result
+
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            wait = self._reserve()
+            if wait:
+                time.sleep(wait)
+            result = self._fetch(lambda: fetch(query))
+            self._store(key, query, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._leave(key)
+
+    async def asearch(self, query: str, afetch: Callable[[str], Awaitable[Any]], namespace: str = "tavily") -> Any:
+        """Async variant of search; sync and async callers share the cache and in-flight calls."""
+        key = self._key(namespace, query)
+        result = await run_sync(self._lookup, key)
+        if result is not None:
+            return result
+
+        future, leader = self._join(key)
+        if leader:
+            # The call runs in its own task: cancelling this caller (e.g. the losing side of
+            # the RAG/web race) must not abort it for the callers sharing it
+            task = asyncio.ensure_future(self._alead(key, query, afetch, future))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        # Shielded, since cancelling a wrap_future wrapper cancels the shared future itself
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["coalesced"]
+            lookups = hits + self.stats["misses"]
+            mean_api = self._api_seconds / self.stats["api_calls"] if self.stats["api_calls"] else 0.0
+            return {
+                **self.stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "mean_api_latency_ms": round(mean_api * 1000, 1),
+                # Every hit (or coalesced wait) avoided one API call of average latency
+                "saved_latency_seconds": round(hits * mean_api, 2),
+                "rate_limit_wait_seconds": round(self._wait_seconds, 2),
+                "memory_entries": len(self._memory),
+                "db_path": self.db_path or None,
+            }
+
+    # --- internals -------------------------------------------------------
+
+    def _key(self, namespace: str, query: str) -> str:
+        return f"{namespace}:{normalize_search_query(query)}"
+
+    def _ttl(self, query: str) -> float:
+        return self.fresh_ttl_seconds if _TIME_SENSITIVE.search(query) else self.ttl_seconds
+
+    def _lookup(self, key: str):
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                if item[1] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return item[0]
+                del self._memory[key]
+
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT result, expires_at FROM searches WHERE key = ?", (key,)).fetchone() if conn else None
+        except sqlite3.Error as e:
+            print(f"⚠️ Web search cache read failed: {e}")  # the disk tier is best effort
+            return None
+        if row is not None and row[1] > now:
+            result = json.loads(row[0])
+            with self._lock:
+                self.stats["disk_hits"] += 1
+                self._remember(key, result, row[1])
+            return result
+        return None
+
+    def _join(self, key: str):
+        """The in-flight future for key and whether this caller must make the call."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future, False
+            future = self._in_flight[key] = Future()
+            self.stats["misses"] += 1
+            return future, True
+
+    async def _alead(self, key: str, query: str, afetch: Callable[[str], Awaitable[Any]], future: Future):
+        try:
+            wait = self._reserve()
+            if wait:
+                await asyncio.sleep(wait)
+            start = time.perf_counter()
+            try:
+                result = await afetch(query)
+            except Exception:
+                self._record_call(time.perf_counter() - start, failed=True)
+                raise
+            self._record_call(time.perf_counter() - start)
+            await run_sync(self._store, key, query, result)
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            self._leave(key)
+
+    def _leave(self, key: str):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _reserve(self) -> float:
+        try:
+            wait = self.rate_limiter.reserve()
+        except RateLimitExceeded:
+            with self._lock:
+                self.stats["rate_limit_rejections"] += 1
+            raise
+        if wait:
+            with self._lock:
+                self.stats["rate_limited_waits"] += 1
+                self._wait_seconds += wait
+        return wait
+
+    def _fetch(self, call: Callable[[], Any]):
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception:
+            self._record_call(time.perf_counter() - start, failed=True)
+            raise
+        self._record_call(time.perf_counter() - start)
+        return result
+
+    def _record_call(self, seconds: float, failed: bool = False):
+        with self._lock:
+            self.stats["api_calls"] += 1
+            self._api_seconds += seconds
+            if failed:
+                self.stats["api_errors"] += 1
+
+    def _store(self, key: str, query: str, result: Any):
+        if not result:
+            return  # empty responses are retried next time
+        expires_at = time.time() + self._ttl(query)
+        with self._lock:
+            self._remember(key, result, expires_at)
+
+        try:
+            conn = self._connection()
+            if conn is not None:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO searches (key, result, expires_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(result), expires_at),
+                    )
+                    conn.execute("DELETE FROM searches WHERE expires_at < ?", (time.time(),))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"⚠️ Web search cache write failed: {e}")
+
+    def _remember(self, key: str, result: Any, expires_at: float):
+        self._memory[key] = (result, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._table_ready:
+                with conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS searches ("
+                        "key TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)"
+                    )
+                self._table_ready = True
+            self._local.conn = conn
+        return conn
+
+
+# Shared by every Tavily caller in the process (the SQLite file is shared across processes)
+web_search_cache = WebSearchCache()
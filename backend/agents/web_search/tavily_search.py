@@ -1,6 +1,8 @@
 import os
-from langchain_tavily import TavilySearch
+from typing import Any, Dict, List
 from dotenv import load_dotenv
+from agents.llm_loader import get_tavily_search
+from agents.web_search.search_cache import web_search_cache
 
 load_dotenv()  # Load TAVILY_API_KEY from .env file
 
@@ -9,17 +11,56 @@ class TavilySearchAgent:
     Handles general web search using Tavily API.
     """
     def __init__(self):
-        self.tavily_search = TavilySearch(max_results=5)  # Uses env var TAVILY_API_KEY
+        self.max_results = 5
+        self.tavily_search = get_tavily_search(max_results=self.max_results)  # Uses env var TAVILY_API_KEY
+
+    def search_results(self, query: str) -> List[Dict[str, str]]:
+        """Search results as [{"title", "url", "content"}] (raises on API errors)."""
+        query = query.strip('"\'')
+        # Cached, deduplicated and rate limited (see search_cache.py)
+        result = web_search_cache.search(
+            query, lambda q: self.tavily_search.invoke({"query": q}), namespace=f"tavily:{self.max_results}"
+        )
+        return parse_results(result)
+
+    async def asearch_results(self, query: str) -> List[Dict[str, str]]:
+        """Async variant of search_results using the tool's native ainvoke."""
+        query = query.strip('"\'')
+        result = await web_search_cache.asearch(
+            query, lambda q: self.tavily_search.ainvoke({"query": q}), namespace=f"tavily:{self.max_results}"
+        )
+        return parse_results(result)
 
     def search_tavily(self, query: str) -> str:
         """Perform a general web search using Tavily API."""
         try:
-            query = query.strip('"\'')
-            result = self.tavily_search.invoke({"query": query})
-
-            if result and isinstance(result, str):
-                return result.strip()
-            return "No relevant results found."
+            return format_results(self.search_results(query))
+        except Exception as e:
+            return f"Error retrieving web search results: {e}"
 
+    async def asearch_tavily(self, query: str) -> str:
+        """Async variant of search_tavily."""
+        try:
+            return format_results(await self.asearch_results(query))
         except Exception as e:
             return f"Error retrieving web search results: {e}"
+
+
+def parse_results(result: Any) -> List[Dict[str, str]]:
+    # TavilySearch returns {"query": ..., "results": [{"title", "url", "content", ...}]};
+    # older tools returned a list of results or a plain string
+    if isinstance(result, dict):
+        result = result.get("results") or []
+    if isinstance(result, str):
+        return [{"title": "", "url": "", "content": result.strip()}] if result.strip() else []
+    return [
+        {"title": item.get("title", ""), "url": item.get("url", ""), "content": item.get("content", "")}
+        for item in result or []
+        if isinstance(item, dict)
+    ]
+
+
+def format_results(results: List[Dict[str, str]]) -> str:
+    if not results:
+        return "No relevant results found."
+    return "\n\n".join(f"{r['title']}\n{r['url']}\n{r['content']}".strip() for r in results)
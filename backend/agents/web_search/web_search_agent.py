@@ -1,5 +1,6 @@
 
 # agents/web_search_agent.py
+from typing import Dict, List
 from .tavily_search import TavilySearchAgent
 
 class WebSearchAgent:
@@ -16,4 +17,21 @@ class WebSearchAgent:
         tavily_results = self.tavily_search_agent.search_tavily(query=query)
         return f"Tavily Results:\n{tavily_results}\n"
 
+    async def asearch(self, query: str) -> str:
+        """
+        Async variant of search.
+        """
+        tavily_results = await self.tavily_search_agent.asearch_tavily(query=query)
+        return f"Tavily Results:\n{tavily_results}\n"
+
+    def search_results(self, query: str) -> List[Dict[str, str]]:
+        """
+        Structured results ({"title", "url", "content"}) for callers that build their own context.
+        """
+        return self.tavily_search_agent.search_results(query=query)
 
+    async def asearch_results(self, query: str) -> List[Dict[str, str]]:
+        """
+        Async variant of search_results.
+        """
+        return await self.tavily_search_agent.asearch_results(query=query)
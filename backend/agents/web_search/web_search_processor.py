@@ -1,51 +1,165 @@
 # processors/web_search_processor.py
 import os
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 load_dotenv()
 from agents.web_search.web_search_agent import WebSearchAgent
 from agents.llm_loader import get_llm  # Assuming a helper to load your default LLM
+from agents.rag_agent.query_expander import ExpansionCache
+from agents.rag_agent.sparse_index import tokenize
+from agents.token_utils import count_tokens, truncate_tokens
+from agents.history_manager import is_follow_up, last_user_message
 
 
 class WebSearchProcessor:
     """
     Processes web search results and routes them to the appropriate LLM for response generation.
+
+    One LLM call per answer: the search query is the user's question, rewritten locally
+    (terms of the previous question appended to follow-ups; cached) only when there is
+    chat history. Results are deduplicated and trimmed to a token budget before the
+    (streamable) summary call.
     """
-    def __init__(self):
+    def __init__(self, context_tokens: int = None, result_tokens: int = None):
         self.web_search_agent = WebSearchAgent()
         self.llm = get_llm()
+        self.context_tokens = context_tokens or int(os.getenv("WEB_CONTEXT_TOKENS", "1500"))
+        self.result_tokens = result_tokens or int(os.getenv("WEB_RESULT_TOKENS", "400"))
+        self._rewrites = ExpansionCache(max_entries=int(os.getenv("WEB_REWRITE_CACHE_SIZE", "2000")))
+        self.stats = {"searches": 0, "rewrites": 0, "rewrite_cache_hits": 0, "results": 0, "duplicates_dropped": 0, "context_tokens": 0}
 
-    def _build_prompt_for_web_search(self, query: str, chat_history: Optional[List[Dict[str, str]]] = None) -> str:
+    def rewrite_query(self, query: str, chat_history: Optional[List[Any]] = None) -> str:
         """
-        Build a prompt to summarize user intent for web search.
+        The web search query for a question. Without history (or for a self-contained
+        question) the question is used as is; a follow-up gets the previous question's
+        key terms appended.
         """
-        prompt = f"""Here are the last few messages from our conversation:
+        query = query.strip()
+        previous = last_user_message(chat_history)
+        if not previous or not is_follow_up(query):
+            return query
+
+        key = f"{previous}\n{query}"
+        cached = self._rewrites.get(key)
+        if cached is not None:
+            self.stats["rewrite_cache_hits"] += 1
+            return cached
+
+        query_terms = set(tokenize(query))
+        terms = [term for term in dict.fromkeys(tokenize(previous)) if term not in query_terms][:6]
+        rewritten = f"{query} {' '.join(terms)}" if terms else query
+        self._rewrites.set(key, rewritten)
+        self.stats["rewrites"] += 1
+        return rewritten
 
-{chat_history}
+    def search(self, query: str, chat_history: Optional[List[Any]] = None) -> str:
+        """
+        Search and return the trimmed, deduplicated results as summary context.
+        """
+        try:
+            results = self.web_search_agent.search_results(self.rewrite_query(query, chat_history))
+        except Exception as e:
+            return f"Error retrieving web search results: {e}"
+        return self.build_context(results)
 
-The user asked the following question:
+    async def asearch(self, query: str, chat_history: Optional[List[Any]] = None) -> str:
+        """
+        Async variant of search. Lets callers fetch results speculatively and summarize
+        them only if needed.
+        """
+        try:
+            results = await self.web_search_agent.asearch_results(self.rewrite_query(query, chat_history))
+        except Exception as e:
+            return f"Error retrieving web search results: {e}"
+        return self.build_context(results)
 
-{query}
+    def process_web_results(
+        self,
+        query: str,
+        chat_history: Optional[List[Any]] = None,
+        web_results: Optional[str] = None
+    ):
+        """
+        Retrieves, summarizes and returns web search results (web_results: already fetched by search).
+        """
+        if web_results is None:
+            web_results = self.search(query, chat_history)
 
-Summarize them into a single, well-formed question only if the past conversation seems relevant to the current query so that it can be used for a web search.
-Keep it concise and ensure it captures the key intent behind the discussion.
-"""
-        return prompt
+        response = self.llm.invoke(self._build_summary_prompt(query, web_results))
+        return response
 
-    def process_web_results(self, query: str, chat_history: Optional[List[Dict[str, str]]] = None) -> str:
+    async def aprocess_web_results(
+        self,
+        query: str,
+        chat_history: Optional[List[Any]] = None,
+        web_results: Optional[str] = None
+    ):
         """
-        Retrieves, summarizes and returns web search results.
+        Async variant of process_web_results (web_results: already fetched by asearch).
         """
-        web_search_query_prompt = self._build_prompt_for_web_search(query, chat_history)
-        web_search_query = self.llm.invoke(web_search_query_prompt)
-        web_results = self.web_search_agent.search(web_search_query.content)
+        if web_results is None:
+            web_results = await self.asearch(query, chat_history)
+
+        response = await self.llm.ainvoke(self._build_summary_prompt(query, web_results))
+        return response
 
-        llm_prompt = (
+    async def astream_web_results(
+        self,
+        query: str,
+        chat_history: Optional[List[Any]] = None,
+        web_results: Optional[str] = None
+    ):
+        """
+        Streams the summarized web search answer token by token (web_results: already fetched by asearch).
+        """
+        if web_results is None:
+            web_results = await self.asearch(query, chat_history)
+
+        async for chunk in self.llm.astream(self._build_summary_prompt(query, web_results)):
+            if chunk.content:
+                yield chunk.content
+
+    def build_context(self, results: List[Dict[str, str]]) -> str:
+        """
+        Numbered results for the summary prompt: duplicate pages (same URL or same opening
+        text) dropped, each result capped at result_tokens, all within context_tokens.
+        """
+        self.stats["searches"] += 1
+        blocks, used = [], 0
+        seen_urls, seen_texts = set(), set()
+        for result in results:
+            content = " ".join((result.get("content") or "").split())
+            url = result.get("url", "")
+            fingerprint = content[:200].lower()
+            if not content or (url and url in seen_urls) or fingerprint in seen_texts:
+                self.stats["duplicates_dropped"] += 1
+                continue
+            seen_urls.add(url)
+            seen_texts.add(fingerprint)
+
+            remaining = self.context_tokens - used
+            if remaining < 50:
+                break
+            block = f"[{len(blocks) + 1}] {result.get('title') or url}\n{url}\n{truncate_tokens(content, min(self.result_tokens, remaining))}"
+            blocks.append(block)
+            used += count_tokens(block)
+
+        self.stats["results"] += len(blocks)
+        self.stats["context_tokens"] += used
+        return "\n\n".join(blocks) if blocks else "No relevant results found."
+
+    def get_stats(self) -> dict:
+        searches = self.stats["searches"]
+        return {
+            **self.stats,
+            "mean_context_tokens": round(self.stats["context_tokens"] / searches, 1) if searches else 0.0,
+        }
+
+    def _build_summary_prompt(self, query: str, web_results: str) -> str:
+        return (
             "You are an AI assistant specialized in medical information. Below are web search results "
             "retrieved for a user query. Summarize and generate a helpful, concise response. "
             "Use reliable sources only and ensure medical accuracy.\n\n"
             f"Query: {query}\n\nWeb Search Results:\n{web_results}\n\nResponse:"
         )
 
-        response = self.llm.invoke(llm_prompt)
-        return response
@@ -0,0 +1,150 @@
+# benchmark_chunking.py
+#
+# Compares chunk profiles (see agents/rag_agent/chunker.py) on the same PDFs:
+# retrieval hit rate / MRR at k and the context tokens each answer would send to the
+# generator, plus chunk counts and chunking/embedding time. Search is exact cosine
+# similarity in memory, so only the chunking differs between profiles.
+#
+#   python benchmark_chunking.py --pdf-dir medical_pdfs
+#   python benchmark_chunking.py --pdf-dir medical_pdfs --queries eval.jsonl
+#
+# eval.jsonl has one {"query": ..., "source": "file.pdf", "page": 3, "answer": "..."} per
+# line; page and answer are optional. A query is a hit when a top-k chunk comes from the
+# expected file (and page) or contains the answer text. Without --queries, sentences
+# sampled from the corpus are used as queries and must find their own page.
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import time
+
+import numpy as np
+
+from agents.llm_loader import get_embedding_model
+from agents.rag_agent.build_rag_vectorstore import extract_pdf_pages, iter_pdf_files
+from agents.rag_agent.chunker import PROFILES, chunk_document
+from agents.token_utils import count_tokens
+
+CONTEXT_SEPARATOR = "\n\n===DOCUMENT SECTION===\n\n"  # as in ResponseGenerator._build_context
+
+
+def load_corpus(pdf_dir, max_files=None):
+    corpus = []
+    for pdf_path in iter_pdf_files(pdf_dir):
+        try:
+            corpus.append((os.path.basename(pdf_path), extract_pdf_pages(pdf_path)))
+        except Exception as e:
+            print(f"❌ Failed to read {pdf_path}: {e}")
+        if max_files and len(corpus) >= max_files:
+            break
+    return corpus
+
+
+def sample_queries(corpus, count, seed=13):
+    """Sentences of 8-40 words from random pages, each expected to retrieve its own page."""
+    rng = random.Random(seed)
+    candidates = []
+    for source, pages in corpus:
+        for page_number, text in pages:
+            for sentence in re.split(r"(?<=[.!?])\s+", " ".join(text.split())):
+                if 8 <= len(sentence.split()) <= 40:
+                    candidates.append({"query": sentence, "source": source, "page": page_number})
+    return rng.sample(candidates, min(count, len(candidates)))
+
+
+def is_hit(chunk, expected):
+    if expected.get("answer") and expected["answer"].lower() in chunk["text"].lower():
+        return True
+    if expected.get("source") != chunk["source"]:
+        return False
+    return expected.get("page") in (None, chunk["page"])
+
+
+def embed(texts, batch_size=64):
+    model = get_embedding_model()
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(model.embed_documents(texts[start:start + batch_size]))
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+def evaluate_profile(profile_name, corpus, queries, query_vectors, k):
+    start = time.perf_counter()
+    chunks = [
+        {"source": source, "page": page_number, "text": text}
+        for source, pages in corpus
+        for page_number, _, text in chunk_document(pages, profile_name)
+    ]
+    chunk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunk_vectors = embed([c["text"] for c in chunks])
+    embed_seconds = time.perf_counter() - start
+
+    chunk_tokens = [count_tokens(c["text"]) for c in chunks]
+    top = np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :k]
+
+    hits, reciprocal_ranks, context_tokens = 0, [], []
+    for expected, indices in zip(queries, top):
+        rank = next((r for r, i in enumerate(indices, start=1) if is_hit(chunks[i], expected)), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        context_tokens.append(count_tokens(CONTEXT_SEPARATOR.join(chunks[i]["text"] for i in indices)))
+
+    return {
+        "profile": profile_name,
+        "chunks": len(chunks),
+        "tokens_per_chunk_mean": round(statistics.mean(chunk_tokens), 1),
+        "tokens_per_chunk_p95": int(np.percentile(chunk_tokens, 95)),
+        "chunk_seconds": round(chunk_seconds, 2),
+        "embed_seconds": round(embed_seconds, 2),
+        f"hit_rate@{k}": round(hits / len(queries), 3),
+        "mrr": round(statistics.mean(reciprocal_ranks), 3),
+        "context_tokens_per_answer": round(statistics.mean(context_tokens), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunk profiles on retrieval quality and prompt cost")
+    parser.add_argument("--pdf-dir", default="medical_pdfs")
+    parser.add_argument("--queries", help="JSONL evaluation set (default: sampled corpus sentences)")
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--k", type=int, default=5, help="Retrieved chunks per query (the RAG agent uses 5)")
+    parser.add_argument("--sample", type=int, default=200, help="Sampled queries when --queries is not given")
+    parser.add_argument("--max-files", type=int, default=None)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.pdf_dir, args.max_files)
+    if not corpus:
+        print("❌ No PDFs found.")
+        return
+    print(f"📂 {len(corpus)} PDFs, {sum(len(pages) for _, pages in corpus)} pages")
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+    else:
+        queries = sample_queries(corpus, args.sample)
+    query_vectors = embed([q["query"] for q in queries])
+    print(f"🔍 {len(queries)} queries, k={args.k}\n")
+
+    results = [evaluate_profile(name.strip(), corpus, queries, query_vectors, args.k) for name in args.profiles.split(",")]
+
+    columns = list(results[0])
+    print("  ".join(f"{c:>24}" for c in columns))
+    for result in results:
+        print("  ".join(f"{str(result[c]):>24}" for c in columns))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
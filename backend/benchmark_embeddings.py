@@ -0,0 +1,140 @@
+# benchmark_embeddings.py
+#
+# Compares embedding backends (EMBEDDING_BACKEND: torch, onnx, onnx-int8) on load time,
+# single-query latency, batch throughput and resident memory, and checks that each
+# backend's vectors agree with the vectors already stored in the Chroma collection
+# (cosine similarity on a sample of chunks). Each backend runs in a fresh process so
+# its memory is measured on its own.
+#
+#   python benchmark_embeddings.py
+#   python benchmark_embeddings.py --backends torch,onnx-int8 --sample 1000
+#
+# Retrieval quality is safe to switch when min agreement stays high (≥ 0.99 is typical
+# for onnx; int8 trades a little agreement for speed and memory).
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from agents.rag_agent.build_rag_vectorstore import CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY, get_collection
+
+
+def rss_mb():
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def load_sample(persist_directory, collection_name, size, seed=13):
+    """Random contiguous slice of stored chunks with their current embeddings."""
+    collection = get_collection(persist_directory, collection_name)
+    count = collection.count()
+    if not count:
+        return [], None
+    offset = random.Random(seed).randrange(max(count - size, 0) + 1)
+    page = collection.get(offset=offset, limit=size, include=["documents", "embeddings"])
+    return page["documents"], np.asarray(page["embeddings"], dtype=np.float32)
+
+
+def run_backend(backend, texts, queries, batch_size):
+    """Runs in a fresh process: load the backend and time it."""
+    from agents.llm_loader import get_embedding_model
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    model = get_embedding_model(backend)
+    model.embed_query("warm up")
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.embed_query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    vectors = []
+    for offset in range(0, len(texts), batch_size):
+        vectors.extend(model.embed_documents(texts[offset:offset + batch_size]))
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "query_p50_ms": round(statistics.median(latencies), 2),
+        "query_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "docs_per_second": round(len(texts) / batch_seconds, 1),
+        "rss_mb": round(rss_mb(), 1),
+        "model_rss_mb": round(rss_mb() - rss_before, 1),
+    }, vectors
+
+
+def agreement(vectors, reference):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    reference = reference / np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    cosines = (vectors * reference).sum(axis=1)
+    return {
+        "cosine_mean": round(float(cosines.mean()), 4),
+        "cosine_min": round(float(cosines.min()), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends on speed, memory and agreement")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--persist-directory", default=CHROMA_PERSIST_DIRECTORY)
+    parser.add_argument("--collection", default=CHROMA_COLLECTION_NAME)
+    parser.add_argument("--sample", type=int, default=500, help="Stored chunks to re-embed")
+    parser.add_argument("--queries", type=int, default=100, help="Single-query latency samples")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    texts, reference = load_sample(args.persist_directory, args.collection, args.sample)
+    if not texts:
+        print("❌ The collection is empty; build it with agents.rag_agent.build_rag_vectorstore first.")
+        return
+    # Query-sized inputs: the opening words of sampled chunks
+    queries = [" ".join(text.split()[:12]) for text in texts[:args.queries]]
+    print(f"🔍 {len(texts)} stored chunks, {len(queries)} queries\n")
+
+    results = []
+    for backend in args.backends.split(","):
+        backend = backend.strip()
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            try:
+                result, vectors = pool.submit(run_backend, backend, texts, queries, args.batch_size).result()
+            except Exception as e:
+                print(f"❌ {backend}: {e}")
+                continue
+        results.append({**result, **agreement(vectors, reference)})
+
+    if not results:
+        return
+    columns = list(results[0])
+    print("  ".join(f"{c:>16}" for c in columns))
+    for result in results:
+        print("  ".join(f"{str(result[c]):>16}" for c in columns))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmark_vector_store.py
+#
+# Compares the vector stores behind the retriever (see agents/rag_agent/vector_store.py)
+# on the same collection: Chroma (HNSW) and mmap exports (float16 / int8, brute force /
+# IVF). Reports recall@k against exact float32 search over the stored vectors and
+# p50/p99 search latency per query (query embedding excluded, it is the same for all).
+#
+#   python benchmark_vector_store.py
+#   python benchmark_vector_store.py --k 30 --nlist 256 --nprobe 16
+#
+# Queries are the opening words of sampled chunks, or --queries eval.jsonl with one
+# {"query": ...} per line (the format benchmark_chunking.py reads).
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from agents.llm_loader import get_embedding_model
+from agents.rag_agent.build_rag_vectorstore import CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY, get_collection
+from agents.rag_agent.vector_store import MmapVectorStore, export_collection
+
+
+def load_collection(collection, page_size=5000):
+    ids, documents, vectors = [], [], []
+    offset = 0
+    while True:
+        page = collection.get(offset=offset, limit=page_size, include=["documents", "embeddings"])
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    return ids, documents, np.concatenate(vectors) if vectors else None
+
+
+def exact_top_k(vectors, queries, k):
+    norms = np.einsum("ij,ij->i", vectors, vectors)
+    distances = norms[None, :] - 2 * queries @ vectors.T
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def evaluate(name, store, query_vectors, truth, k):
+    latencies, recalls = [], []
+    store.query(query_embeddings=query_vectors[:1], n_results=k)  # open / warm up
+    for vector, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        result = store.query(query_embeddings=vector[None, :], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(set(result["ids"][0]) & expected) / k)
+    return {
+        "store": name,
+        f"recall@{k}": round(float(np.mean(recalls)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Chroma with the mmap vector index on recall and latency")
+    parser.add_argument("--persist-directory", default=CHROMA_PERSIST_DIRECTORY)
+    parser.add_argument("--collection", default=CHROMA_COLLECTION_NAME)
+    parser.add_argument("--queries", help="JSONL evaluation set (default: sampled chunk openings)")
+    parser.add_argument("--sample", type=int, default=200, help="Sampled queries when --queries is not given")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists to test as well (default: ~4*sqrt(N))")
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    collection = get_collection(args.persist_directory, args.collection)
+    ids, documents, vectors = load_collection(collection)
+    if vectors is None:
+        print("❌ The collection is empty; build it with agents.rag_agent.build_rag_vectorstore first.")
+        return
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [json.loads(line)["query"] for line in f if line.strip()]
+    else:
+        sample = random.Random(13).sample(documents, min(args.sample, len(documents)))
+        queries = [" ".join(text.split()[:12]) for text in sample]
+    query_vectors = np.asarray(get_embedding_model().embed_documents(queries), dtype=np.float32)
+    truth = [{ids[i] for i in row} for row in exact_top_k(vectors, query_vectors, args.k)]
+    print(f"🔍 {len(ids)} chunks, {len(queries)} queries, k={args.k}\n")
+
+    nlist = args.nlist or int(4 * np.sqrt(len(ids)))
+    results = [evaluate("chroma", collection, query_vectors, truth, args.k)]
+    for dtype, lists in (("float16", 0), ("int8", 0), ("float16", nlist), ("int8", nlist)):
+        with tempfile.TemporaryDirectory() as directory:
+            export_collection(collection, directory, dtype=dtype, nlist=lists)
+            name = f"mmap-{dtype}" + (f"-ivf{lists}/{args.nprobe}" if lists else "")
+            store = MmapVectorStore(directory, nprobe=args.nprobe)
+            results.append({**evaluate(name, store, query_vectors, truth, args.k),
+                            "disk_mb": round(sum(os.path.getsize(os.path.join(root, f))
+                                                 for root, _, files in os.walk(directory) for f in files) / 2**20, 1)})
+
+    columns = list(results[-1])
+    print("  ".join(f"{c:>24}" for c in columns))
+    for result in results:
+        print("  ".join(f"{str(result.get(c, '')):>24}" for c in columns))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
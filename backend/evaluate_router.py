@@ -0,0 +1,83 @@
+# evaluate_router.py
+#
+# Offline check of the embedding router against the LLM router.
+# For every query both routers run; we report how often the local router decides on
+# its own (coverage), how often it agrees with the LLM when it does, and latency.
+#
+#   python evaluate_router.py                      # built-in sample queries
+#   python evaluate_router.py --queries my_queries.txt   # one query per line
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from agents.agent_decision import llm_route
+from agents.semantic_router import SemanticRouter
+
+SAMPLE_QUERIES = [
+    "hello there",
+    "what is a fever?",
+    "I keep waking up at night, any tips?",
+    "what is the normal HbA1c target for diabetic patients?",
+    "what are the side effects of lisinopril?",
+    "how is atrial fibrillation managed?",
+    "which antibiotics are used for urinary tract infections?",
+    "explain the stages of chronic kidney disease in a table",
+    "latest news on the measles outbreak",
+    "new FDA approvals for obesity medication this year",
+    "recent research on microplastics and heart disease",
+    "what's the newest treatment for multiple sclerosis?",
+    "thank you so much",
+    "my stomach hurts after eating, what could it be?",
+    "what does the guideline recommend for gestational diabetes screening?",
+]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure agreement between the embedding router and the LLM router")
+    parser.add_argument("--queries", help="Text file with one query per line")
+    args = parser.parse_args()
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = SAMPLE_QUERIES
+
+    router = SemanticRouter()
+    router.scores("warm up")  # load the model and prototypes outside the timings
+
+    decided = agreed = 0
+    local_time = llm_time = 0.0
+    confusion = Counter()
+
+    for query in queries:
+        start = time.perf_counter()
+        local_label, margin = router.route(query)
+        local_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        llm_label = await llm_route([], query)
+        llm_time += time.perf_counter() - start
+
+        if local_label is not None:
+            decided += 1
+            agreed += local_label == llm_label
+            confusion[(llm_label, local_label)] += 1
+
+        print(f"{'✅' if local_label in (None, llm_label) else '❌'} llm={llm_label:<27} local={str(local_label):<27} margin={margin:.3f}  {query}")
+
+    print("\n--- Summary ---")
+    print(f"Queries:               {len(queries)}")
+    print(f"Decided locally:       {decided} ({decided / len(queries):.0%})")
+    print(f"Agreement when local:  {agreed}/{decided} ({agreed / decided:.0%})" if decided else "Agreement when local:  n/a")
+    print(f"Mean local latency:    {1000 * local_time / len(queries):.1f} ms")
+    print(f"Mean LLM latency:      {1000 * llm_time / len(queries):.1f} ms")
+    print("\nConfusion (llm -> local):")
+    for (llm_label, local_label), count in sorted(confusion.items()):
+        print(f"  {llm_label:<27} -> {local_label:<27} {count}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+# load_test.py
+#
+# Fires concurrent /chat requests at a running backend and prints throughput per
+# concurrency level. With the async graph a single uvicorn worker should show
+# requests/s growing with concurrency instead of staying flat.
+#
+#   uvicorn main:app --workers 1
+#   python load_test.py --url http://127.0.0.1:8000 --levels 1 4 16 32
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+QUERIES = [
+    "What are the common symptoms of diabetes?",
+    "How is hypertension usually managed?",
+    "What is a normal resting heart rate?",
+    "What are the latest treatments for migraine?",
+]
+
+
+async def _one_request(client: httpx.AsyncClient, url: str, i: int) -> float:
+    start = time.perf_counter()
+    response = await client.post(
+        f"{url}/chat",
+        data={"message": QUERIES[i % len(QUERIES)], "session_id": f"load_{uuid.uuid4().hex}"},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run_level(url: str, concurrency: int, requests_per_level: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(timeout=120) as client:
+
+        async def worker(i: int):
+            nonlocal errors
+            async with semaphore:
+                try:
+                    latencies.append(await _one_request(client, url, i))
+                except Exception as e:
+                    errors += 1
+                    print(f"❌ Request {i} failed: {e}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(requests_per_level)))
+        elapsed = time.perf_counter() - start
+
+    if latencies:
+        p50 = statistics.median(latencies)
+        p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+    else:
+        p50 = p95 = float("nan")
+    print(
+        f"concurrency={concurrency:>3}  ok={len(latencies):>4}  errors={errors:>3}  "
+        f"throughput={len(latencies) / elapsed:6.2f} req/s  p50={p50:5.2f}s  p95={p95:5.2f}s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrency load test for the /chat endpoint")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    args = parser.parse_args()
+
+    for level in args.levels:
+        await run_level(args.url, level, args.requests)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
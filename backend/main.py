@@ -1,23 +1,38 @@
 
 
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Optional
 from dotenv import load_dotenv
+import asyncio
 import shutil
+import json
 
-from agents.guardrails import LocalGuardrails
-from agents.agent_decision import medical_agent_graph
-from agents.llm_loader import get_llm
-from langchain_core.messages import BaseMessage
+# Only light modules at import time: langgraph, torch, chromadb, Tavily and PIL are
+# pulled in by agents.agent_decision, which is imported by the warm-up or the first request
+from agents.async_utils import run_sync, shutdown_executor
+from agents.startup import WarmupTracker
+from agents.session_store import create_session_store
 
 import os
 
 load_dotenv()
 
-llm = get_llm()
-guard = LocalGuardrails(llm=llm)
+# background (default): serve health checks at once, warm up in a background task
+# lazy: load each component on the first request that needs it
+# eager: finish the warm-up before the worker accepts requests
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background").lower()
+
+# Components that must be warm before /readyz reports ready
+REQUIRED_COMPONENTS = ("agents", "llm", "embeddings", "vectorstore")
+warmup = WarmupTracker(["agents", "llm", "embeddings", "vectorstore", "vision", "tavily"])
+
+_agent_decision = None
+_agent_decision_lock = asyncio.Lock()
 
 app = FastAPI()
 
@@ -30,34 +45,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ✅ Memory for session chat history
-session_memory: dict[str, list[BaseMessage]] = {}
+# ✅ Session chat history (bounded in-memory LRU or SQLite shared by all workers, see SESSION_STORE)
+session_store = create_session_store()
+
+# ✅ Deferred agent graph: imported once, by the warm-up or by the first request that needs it
+def _import_agents():
+    global _agent_decision
+    import agents.agent_decision as agent_decision
+    _agent_decision = agent_decision
+
+async def get_agent_decision():
+    if _agent_decision is None:
+        async with _agent_decision_lock:
+            if _agent_decision is None:
+                await run_sync(warmup.run, "agents", _import_agents)
+    return _agent_decision
+
+def _warm_up_components():
+    from agents.llm_loader import get_llm, get_vision_llm, get_embedding_service, get_tavily_search
+    from agents.rag_agent.document_retriever import vector_store, reranker
 
-# ✅ Core input handler
-def handle_user_input(
+    loaders = [
+        ("agents", _import_agents),
+        ("llm", get_llm),
+        ("embeddings", lambda: get_embedding_service().warm_up()),
+        ("vectorstore", lambda: vector_store.count()),
+        ("reranker", lambda: reranker.warm_up()),
+        ("vision", get_vision_llm),
+        ("tavily", get_tavily_search),
+    ]
+    for name, loader in loaders:
+        if warmup.is_ready(name):
+            continue
+        try:
+            warmup.run(name, loader)
+        except Exception:
+            pass  # recorded as failed in /readyz; requests retry lazily
+
+@app.on_event("startup")
+async def on_startup():
+    print(f"✅ App module imported in {APP_IMPORT_SECONDS:.2f}s (startup mode: {STARTUP_MODE})")
+    if STARTUP_MODE == "eager":
+        await run_sync(_warm_up_components)
+    elif STARTUP_MODE == "background":
+        app.state.warmup_task = asyncio.create_task(run_sync(_warm_up_components))
+
+# ✅ Release the bounded executor on shutdown
+@app.on_event("shutdown")
+async def on_shutdown():
+    shutdown_executor()
+
+# ✅ Initial graph state for a turn
+async def _build_input_state(
     user_input: Optional[str],
     session_id: str,
     image_bytes: Optional[bytes] = None,
-    image_type: Optional[str] = None
-) -> str:
-    messages = session_memory.get(session_id, [])
+    image_type: Optional[str] = None,
+    specialty: Optional[str] = None
+) -> dict:
+    messages = await run_sync(session_store.get, session_id)
 
     # Detect type
     input_type = "image" if image_bytes else \
                  "text"
 
-    image_path = None
-    if image_bytes:
-        ext = image_type.split("/")[-1]
-        image_path = f"temp_uploaded_image.{ext}"
-        with open(image_path, "wb") as f:
-            f.write(image_bytes)
-
-    # Prepare input state
-    input_state = {
+    return {
         "input": user_input or "",
         "image": image_bytes,  # raw bytes
-        "image_path": image_path,  # path for analysis agent
         "image_type": image_type or "",
         "input_type": input_type,
         "agent_name": "",
@@ -65,25 +119,83 @@ def handle_user_input(
         "involved_agents": [],
         "bypass_guardrails": False,
         "messages": messages,
+        "rag_specialty": specialty,
     }
 
+# ✅ Persist the turn, then fold old turns into the rolling summary in the background
+async def _save_history(session_id: str, messages: list):
+    await run_sync(session_store.set, session_id, messages)
+
+    from agents.history_manager import schedule_compaction  # already loaded with the agent graph
+    schedule_compaction(session_id, session_store)
+
+# ✅ Core input handler (async end to end: the graph is awaited, never run on the event loop thread)
+async def handle_user_input(
+    user_input: Optional[str],
+    session_id: str,
+    image_bytes: Optional[bytes] = None,
+    image_type: Optional[str] = None,
+    specialty: Optional[str] = None
+) -> str:
+    # Prepare input state (the image agent works on the uploaded bytes in memory)
+    input_state = await _build_input_state(user_input, session_id, image_bytes, image_type, specialty)
+
     # Run through decision graph
-    output = medical_agent_graph.invoke(input_state)
+    agent_decision = await get_agent_decision()
+    output = await agent_decision.medical_agent_graph.ainvoke(input_state)
 
     # Update chat history
-    session_memory[session_id] = output["messages"]
-
-    # Clean up temporary image file
-    if image_path and os.path.exists(image_path):
-        os.remove(image_path)
+    await _save_history(session_id, output["messages"])
 
     return output["response"]
 
-# ✅ Route: Text-only chat
+# ✅ Route: Liveness (never touches the models)
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+# ✅ Route: Readiness with each component's warm-up state
+@app.get("/readyz")
+async def readyz():
+    components = warmup.snapshot()
+    # In lazy mode components load on demand, so the worker can take traffic right away
+    ready = STARTUP_MODE == "lazy" or all(components[name]["state"] == "ready" for name in REQUIRED_COMPONENTS)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "startup_mode": STARTUP_MODE,
+            "app_import_seconds": round(APP_IMPORT_SECONDS, 3),
+            "components": components,
+        },
+    )
+
+# ✅ Route: Runtime statistics for tuning the fast paths
+@app.get("/stats")
+async def stats():
+    sessions = await run_sync(session_store.get_stats)
+    if _agent_decision is None:
+        return {"warming_up": True, "sessions": sessions}
+    from agents.rag_agent import document_retriever  # loaded with the agent graph
+    from agents.llm_loader import get_embedding_service
+    from agents.web_search.search_cache import web_search_cache
+    return {
+        "sessions": sessions,
+        "guardrails": _agent_decision.guard.get_stats(),
+        "router": _agent_decision.semantic_router.get_stats() if _agent_decision.semantic_router else None,
+        "response_cache": _agent_decision.response_cache.get_stats() if _agent_decision.response_cache else None,
+        "query_expansion": document_retriever.expander.get_stats(),
+        "reranker": document_retriever.reranker.get_stats(),
+        "embeddings": get_embedding_service().get_stats(),
+        "web_search": web_search_cache.get_stats(),
+        "web_processor": _agent_decision.web_agent.get_stats(),
+    }
+
+# ✅ Route: Text-only chat (optional specialty scopes document search to one sub-folder)
 @app.post("/chat")
-async def chat(message: str = Form(...), session_id: str = Form(...)):
+async def chat(message: str = Form(...), session_id: str = Form(...), specialty: Optional[str] = Form(None)):
     try:
-        reply = handle_user_input(user_input=message, session_id=session_id)
+        reply = await handle_user_input(user_input=message, session_id=session_id, specialty=specialty)
         return {"reply": reply}
     except Exception as e:
         print("Error in /chat:", e)
@@ -101,7 +213,7 @@ async def upload(
         image_type = file.content_type
 
         # Combined image + optional message
-        reply = handle_user_input(
+        reply = await handle_user_input(
             user_input=message,
             session_id=session_id,
             image_bytes=contents,
@@ -111,3 +223,65 @@ async def upload(
     except Exception as e:
         print("Error in /upload:", e)
         return JSONResponse(status_code=500, content={"reply": "Server error while processing your image."})
+
+# ✅ Streaming input handler: Server-Sent Events with tokens as each agent produces them
+def _sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+async def stream_user_input(
+    user_input: Optional[str],
+    session_id: str,
+    image_bytes: Optional[bytes] = None,
+    image_type: Optional[str] = None,
+    specialty: Optional[str] = None
+):
+    try:
+        input_state = await _build_input_state(user_input, session_id, image_bytes, image_type, specialty)
+
+        # Guardrails, routing and the chosen agent; tokens are forwarded as they arrive
+        agent_decision = await get_agent_decision()
+        async for event in agent_decision.astream_agent_response(input_state):
+            if event["type"] == "agent":
+                yield _sse({"agent": event["agent_name"]})
+            elif event["type"] == "token":
+                yield _sse({"token": event["content"]})
+            elif event["type"] == "reset":
+                yield _sse({"reset": True})
+            elif event["type"] == "done":
+                output = event["state"]
+                # Update chat history with the complete message (footers included)
+                await _save_history(session_id, output["messages"])
+                yield _sse({"done": True, "agent": output["agent_name"], "reply": output["response"]})
+    except Exception as e:
+        print("Error in stream:", e)
+        yield _sse({"error": "Server error while processing your message."})
+
+# ✅ Route: Text-only chat, streamed
+@app.post("/chat/stream")
+async def chat_stream(message: str = Form(...), session_id: str = Form(...), specialty: Optional[str] = Form(None)):
+    return StreamingResponse(
+        stream_user_input(user_input=message, session_id=session_id, specialty=specialty),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ✅ Route: Image + optional message, streamed
+@app.post("/upload/stream")
+async def upload_stream(
+    file: UploadFile = File(...),
+    session_id: str = Form(...),
+    message: Optional[str] = Form(None)
+):
+    contents = await file.read()
+    return StreamingResponse(
+        stream_user_input(
+            user_input=message,
+            session_id=session_id,
+            image_bytes=contents,
+            image_type=file.content_type
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+APP_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
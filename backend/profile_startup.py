@@ -0,0 +1,115 @@
+# profile_startup.py
+#
+# Records an import-time profile of the backend so startup regressions are visible.
+# Runs `python -X importtime` in a fresh interpreter for the app module (fast path,
+# what uvicorn pays before it can answer /healthz) and for the agent graph (what the
+# warm-up pays), prints the slowest top-level imports and writes a JSON profile.
+#
+#   python profile_startup.py                               # write startup_profile.json
+#   python profile_startup.py --baseline startup_profile.json   # compare, exit 1 on regression
+#
+# A comparison run does not overwrite its baseline: without --output nothing is written
+# when the default output is the baseline, and --output equal to --baseline is refused.
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+TARGETS = {
+    "app": "import main",
+    "agents": "import agents.agent_decision",
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _imported_modules(completed) -> list:
+    """(module, level, cumulative_ms) for each line of an -X importtime report."""
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            modules.append((match.group(4), (len(match.group(3)) - 1) // 2, int(match.group(2)) / 1000))
+    return modules
+
+
+def _interpreter_startup_modules() -> set:
+    """Modules every interpreter imports before running -c (site, encodings, ...)."""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True)
+    return {module for module, _, _ in _imported_modules(completed)}
+
+
+def profile(statement: str, ignore: set = frozenset()) -> dict:
+    """Return {"total_ms", "top": [(module, cumulative_ms), ...]} for one import statement."""
+    timed = f"import time; _t = time.perf_counter(); {statement}; print(1000 * (time.perf_counter() - _t))"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", timed],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "import failed")
+
+    target_modules = {word for word in statement.split() if word != "import"}
+    heaviest = [
+        (module, cumulative_ms)
+        for module, level, cumulative_ms in _imported_modules(completed)
+        # The statement's own modules are level 0; what they pull in directly is level 1
+        if level <= 1 and module not in target_modules and module not in ignore
+    ]
+
+    heaviest.sort(key=lambda item: item[1], reverse=True)
+    return {
+        "total_ms": round(float(completed.stdout.strip().splitlines()[-1]), 1),
+        "top": [(module, round(ms, 1)) for module, ms in heaviest[:15]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the FastAPI backend")
+    parser.add_argument("--output", help="Where to write the profile (default: startup_profile.json)")
+    parser.add_argument("--baseline", help="Previous profile to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before failing")
+    args = parser.parse_args()
+
+    baseline = None
+    output = args.output or "startup_profile.json"
+    if args.baseline:
+        if os.path.exists(output) and os.path.samefile(output, args.baseline):
+            if args.output:
+                parser.error("--output must differ from --baseline")
+            output = None  # comparison only; keep the baseline
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    ignore = _interpreter_startup_modules()
+    results = {}
+    for name, statement in TARGETS.items():
+        results[name] = profile(statement, ignore)
+        print(f"\n=== {name}: `{statement}` → {results[name]['total_ms']:.0f} ms")
+        for module, ms in results[name]["top"]:
+            print(f"  {ms:9.1f} ms  {module}")
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Profile written to {output}")
+
+    if baseline is not None:
+        regressed = False
+        for name, result in results.items():
+            before = baseline.get(name, {}).get("total_ms")
+            if not before:
+                continue
+            change = (result["total_ms"] - before) / before
+            status = "❌" if change > args.tolerance else "✅"
+            regressed |= change > args.tolerance
+            print(f"{status} {name}: {before:.0f} ms → {result['total_ms']:.0f} ms ({change:+.0%})")
+        sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import asyncio
 from agents.agent_decision import medical_agent_graph  # or wherever it's saved
 
 input_state = {
@@ -13,7 +14,7 @@ input_state = {
 }
 
 # Run the LangGraph with your test state
-output = medical_agent_graph.invoke(input_state)
+output = asyncio.run(medical_agent_graph.ainvoke(input_state))
 
 print("\n--- Final Output ---")
 print("Agent used:", output['agent_name'])
@@ -0,0 +1,5 @@
+# Run from the backend directory: python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
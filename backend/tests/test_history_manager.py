@@ -0,0 +1,34 @@
+import pytest
+
+history = pytest.importorskip("agents.history_manager")
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+
+def _summary(text):
+    return SystemMessage(content=text, additional_kwargs={history.SUMMARY_MARKER: True})
+
+
+def test_summary_is_kept_when_recent_turns_exceed_the_budget():
+    manager = history.HistoryManager()
+    manager.budgets["ROUTER"] = 200
+    summary = _summary("Summary of the earlier conversation: type 2 diabetes, on metformin.")
+    turns = []
+    for i in range(20):
+        turns += [HumanMessage(content=f"question {i} " + "word " * 20), AIMessage(content=f"answer {i} " + "word " * 20)]
+    assert sum(history.message_tokens(m) for m in turns) > 200
+
+    prepared = manager.prepare([summary] + turns, "ROUTER")
+
+    assert prepared[0] is summary
+    assert prepared[-1] is turns[-1]
+    assert sum(history.message_tokens(m) for m in prepared) <= 200
+
+
+def test_summary_larger_than_the_budget_is_dropped():
+    manager = history.HistoryManager()
+    manager.budgets["ROUTER"] = 20
+    turns = [HumanMessage(content="hi"), AIMessage(content="hello")]
+
+    prepared = manager.prepare([_summary("word " * 200)] + turns, "ROUTER")
+
+    assert prepared == turns
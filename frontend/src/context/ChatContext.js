@@ -1,11 +1,11 @@
 import React, { createContext, useContext, useState, useReducer, useEffect } from 'react';
-import axios from 'axios';
 
 const ChatContext = createContext();
 
 // Action types
 const CHAT_ACTIONS = {
   ADD_MESSAGE: 'ADD_MESSAGE',
+  UPDATE_MESSAGE: 'UPDATE_MESSAGE',
   SET_LOADING: 'SET_LOADING',
   SET_ERROR: 'SET_ERROR',
   CLEAR_ERROR: 'CLEAR_ERROR',
@@ -21,6 +21,13 @@ const chatReducer = (state, action) => {
         ...state,
         messages: [...state.messages, action.payload]
       };
+    case CHAT_ACTIONS.UPDATE_MESSAGE:
+      return {
+        ...state,
+        messages: state.messages.map((msg) =>
+          msg.id === action.payload.id ? { ...msg, ...action.payload } : msg
+        )
+      };
     case CHAT_ACTIONS.SET_LOADING:
       return {
         ...state,
@@ -117,11 +124,58 @@ export const ChatProvider = ({ children }) => {
     }
   }, [state.messages]);
 
+  // Post a form to a Server-Sent Events endpoint and render tokens as they arrive
+  const streamReply = async (endpoint, formData, aiMessageId) => {
+    const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+      method: 'POST',
+      body: formData,
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Streaming request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const event of events) {
+        if (!event.startsWith('data: ')) continue;
+        const data = JSON.parse(event.slice(6));
+
+        if (data.error) {
+          throw new Error(data.error);
+        } else if (data.reset) {
+          text = '';
+        } else if (data.token) {
+          text += data.token;
+        } else if (data.done) {
+          text = data.reply;
+        }
+        if (data.agent) {
+          dispatch({ type: CHAT_ACTIONS.SET_CURRENT_AGENT, payload: data.agent });
+        }
+        dispatch({ type: CHAT_ACTIONS.SET_TYPING, payload: false });
+        dispatch({
+          type: CHAT_ACTIONS.UPDATE_MESSAGE,
+          payload: { id: aiMessageId, text, ...(data.agent && { agent: data.agent }) }
+        });
+      }
+    }
+  };
+
   // Send text message
   const sendMessage = async (message) => {
     try {
       console.log('🚀 Sending message:', message);
-      console.log('📡 API URL:', `${API_BASE_URL}/chat`);
+      console.log('📡 API URL:', `${API_BASE_URL}/chat/stream`);
       console.log('🆔 Session ID:', sessionId);
       
       dispatch({ type: CHAT_ACTIONS.CLEAR_ERROR });
@@ -142,25 +196,19 @@ export const ChatProvider = ({ children }) => {
       formData.append('message', message);
       formData.append('session_id', sessionId);
 
-      console.log('📤 Sending request to backend...');
-      const response = await axios.post(`${API_BASE_URL}/chat`, formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-      });
-      
-      console.log('📥 Backend response:', response.data);
-
-      // Add AI response to chat
+      // Placeholder AI message filled in token by token
       const aiMessage = {
         id: Date.now() + 1,
-        text: response.data.reply,
+        text: '',
         sender: 'ai',
         timestamp: new Date().toISOString(),
         agent: state.currentAgent
       };
       dispatch({ type: CHAT_ACTIONS.ADD_MESSAGE, payload: aiMessage });
 
+      console.log('📤 Streaming request to backend...');
+      await streamReply('/chat/stream', formData, aiMessage.id);
+
     } catch (error) {
       console.error('❌ Error sending message:', error);
       console.error('❌ Error details:', error.response?.data || error.message);
@@ -207,22 +255,18 @@ export const ChatProvider = ({ children }) => {
         formData.append('message', message);
       }
 
-      const response = await axios.post(`${API_BASE_URL}/upload`, formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-      });
-
-      // Add AI response to chat
+      // Placeholder AI message filled in token by token
       const aiMessage = {
         id: Date.now() + 1,
-        text: response.data.reply,
+        text: '',
         sender: 'ai',
         timestamp: new Date().toISOString(),
         agent: 'IMAGE_ANALYSIS_AGENT'
       };
       dispatch({ type: CHAT_ACTIONS.ADD_MESSAGE, payload: aiMessage });
 
+      await streamReply('/upload/stream', formData, aiMessage.id);
+
     } catch (error) {
       console.error('Error sending image:', error);
       dispatch({ type: CHAT_ACTIONS.SET_ERROR, payload: 'Failed to process image. Please try again.' });